@@ -0,0 +1,65 @@
+"""
+Hatch build hook that precompiles pyrepo's Jinja templates into Python modules
+for loading via `jinja2.ModuleLoader` so that installed copies of pyrepo don't
+have to parse & compile the templates at runtime
+"""
+
+from __future__ import annotations
+import json
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Any
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+import jinja2
+from jinja2 import nodes
+
+TEMPLATES_DIR = Path("src", "pyrepo", "templates")
+
+#: Path within the wheel at which to place the compiled templates
+COMPILED_TEMPLATES_PATH = "pyrepo/_compiled_templates"
+
+#: File containing the options that affect how templates are compiled; these
+#: are shared with `pyrepo.util.get_jinja_env()`, which checks them against the
+#: manifest written alongside the compiled templates.
+JINJA_OPTIONS_FILE = Path("src", "pyrepo", "data", "jinja-options.json")
+
+
+def load_jinja_options(root: Path) -> dict[str, Any]:
+    with (root / JINJA_OPTIONS_FILE).open(encoding="utf-8") as fp:
+        options = json.load(fp)
+    assert isinstance(options, dict)
+    return options
+
+
+def compile_templates(srcdir: Path, outdir: Path, options: dict[str, Any]) -> None:
+    jenv = jinja2.Environment(loader=jinja2.FileSystemLoader(srcdir), **options)
+    # The compiler refuses to compile calls to unknown filters, so register
+    # placeholders for pyrepo's custom filters; the real filters are looked up
+    # by name when the templates are rendered.
+    for name in jenv.list_templates():
+        source, _, _ = jenv.loader.get_source(jenv, name)  # type: ignore[union-attr]
+        for node in jenv.parse(source).find_all(nodes.Filter):
+            jenv.filters.setdefault(node.name, lambda v: v)
+    jenv.compile_templates(outdir, zip=None, ignore_errors=False)
+    with (outdir / "manifest.json").open("w", encoding="utf-8") as fp:
+        json.dump({"jinja2": jinja2.__version__, "options": options}, fp)
+
+
+class CustomBuildHook(BuildHookInterface):
+    def initialize(self, version: str, build_data: dict[str, Any]) -> None:
+        if self.target_name != "wheel" or version == "editable":
+            return
+        self.tmpdir = Path(tempfile.mkdtemp(prefix="pyrepo-templates-"))
+        compile_templates(
+            Path(self.root, TEMPLATES_DIR),
+            self.tmpdir,
+            load_jinja_options(Path(self.root)),
+        )
+        build_data["force_include"][str(self.tmpdir)] = COMPILED_TEMPLATES_PATH
+
+    def finalize(
+        self, _version: str, _build_data: dict[str, Any], _artifact_path: str
+    ) -> None:
+        if (tmpdir := getattr(self, "tmpdir", None)) is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
@@ -1,4 +1,3 @@
-from importlib import import_module
 import os
 from pathlib import Path
 import sys
@@ -6,13 +5,30 @@ import click
 from click_loglevel import LogLevel
 import colorlog
 from . import __version__
-from .clack import ConfigurableGroup
+from .cache import OFFLINE_ENVVAR
+from .clack import LazyConfigurableGroup
 from .config import DEFAULT_CFG, configure
 
 
 @click.group(
-    cls=ConfigurableGroup,
-    allow_config=["log_level"],
+    cls=LazyConfigurableGroup,
+    allow_config=["log_level", "offline"],
+    lazy_commands={
+        cmdname: f"pyrepo.commands.{cmdname.replace('-', '_')}:cli"
+        for cmdname in [
+            "add-ci-testenv",
+            "add-pyversion",
+            "add-typing",
+            "begin-dev",
+            "drop-pyversion",
+            "init",
+            "inspect",
+            "mkgithub",
+            "release",
+            "template",
+            "unflatten",
+        ]
+    },
     context_settings={"help_option_names": ["-h", "--help"]},
 )
 @click.option(
@@ -41,16 +57,24 @@ from .config import DEFAULT_CFG, configure
     help="Set logging level",
     show_default=True,
 )
+@click.option(
+    "--offline",
+    is_flag=True,
+    help="Use cached or bundled data instead of fetching it from the network",
+)
 @click.version_option(
     __version__,
     "-V",
     "--version",
     message="jwodder-pyrepo %(version)s",
 )
-def main(chdir: Path | None, log_level: int) -> None:
+def main(chdir: Path | None, log_level: int, offline: bool) -> None:
     """Manage Python packaging boilerplate"""
     if chdir is not None:
         os.chdir(chdir)
+    if offline:
+        # Set via the environment so that subprocesses inherit it
+        os.environ[OFFLINE_ENVVAR] = "1"
     colorlog.basicConfig(
         format="%(log_color)s[%(levelname)-8s] %(message)s",
         log_colors={
@@ -65,22 +89,5 @@ def main(chdir: Path | None, log_level: int) -> None:
     )
 
 
-for fpath in Path(__file__).with_name("commands").iterdir():
-    modname = fpath.stem
-    if (
-        modname.isidentifier()
-        and not modname.startswith("_")
-        and (
-            fpath.suffix == ""
-            and (fpath / "__init__.py").exists()
-            or fpath.suffix == ".py"
-        )
-    ):
-        submod = import_module(f".{modname}", "pyrepo.commands")
-        main.add_command(
-            submod.cli,  # type: ignore[attr-defined]
-            modname.replace("_", "-"),
-        )
-
 if __name__ == "__main__":
     main()
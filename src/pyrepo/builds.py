@@ -0,0 +1,255 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import timedelta
+from hashlib import sha256
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import sys
+from tempfile import mkdtemp
+import time
+from typing import TYPE_CHECKING, Any
+from .cache import (
+    REPO_CACHE_DIRNAME,
+    Fingerprint,
+    file_digest,
+    get_cache_dir,
+    is_offline,
+)
+from .util import readcmd, runcmd
+
+if TYPE_CHECKING:
+    from .project import Project
+
+log = logging.getLogger(__name__)
+
+#: Name of the directory inside the per-repository cache directory in which
+#: build artifacts are cached
+BUILD_CACHE_DIRNAME = "builds"
+
+#: Name of the file in each cached build listing the artifacts' digests
+MANIFEST_FILENAME = "manifest.json"
+
+#: Maximum number of builds to keep in a repository's build cache; the least
+#: recently used builds are deleted first
+BUILD_CACHE_SIZE = 3
+
+#: Name of the directory inside the user cache directory in which prepared
+#: build environments are kept
+BUILD_ENV_DIRNAME = "build-envs"
+
+#: Name of the file written to a build environment once its requirements have
+#: been installed
+BUILD_ENV_MARKER = ".pyrepo-ready"
+
+#: How long a build environment is used before it is recreated so that
+#: unpinned build requirements are upgraded
+BUILD_ENV_TTL = timedelta(days=7)
+
+
+def get_build_key(project: Project, sdist: bool, wheel: bool) -> str:
+    """
+    Return a key identifying the artifacts that building ``project`` would
+    produce.  The key is derived from the files tracked in the Git index, the
+    contents of any files that differ from the index or are untracked (but not
+    ignored), the ``build-system`` table in :file:`pyproject.toml`, and the
+    types of artifacts requested.
+    """
+    fp = Fingerprint()
+    fp.add_data(f"sdist={sdist} wheel={wheel}")
+    fp.add_data(sys.implementation.cache_tag or sys.version)
+    build_system = project.pyproject.data().get("build-system", {})
+    fp.add_data(json.dumps(build_system, sort_keys=True))
+    repo = project.repo
+    # Mode, blob ID, and path of every file in the index:
+    fp.add_data(repo.read("ls-files", "--stage", "--", "."))
+    for p in sorted(
+        set(
+            repo.ls_files(
+                "--modified", "--others", "--exclude-standard", "--deduplicate"
+            )
+        )
+    ):
+        path = project.directory / p
+        try:
+            fp.add_data(f"{p}:{file_digest(path)}")
+        except FileNotFoundError:
+            fp.add_data(f"{p}:-")
+        except IsADirectoryError:
+            # Submodules & nested repositories
+            fp.add_data(f"{p}:/")
+    if project.details.uses_versioningit:
+        # The version is derived from the tags, not just the files
+        fp.add_data(repo.read("describe", "--tags", "--long", "--always"))
+    return fp.hexdigest()
+
+
+@dataclass
+class BuildCache:
+    """
+    A directory of previously-built artifacts, stored in subdirectories named
+    after the keys returned by `get_build_key()`
+    """
+
+    directory: Path
+
+    @classmethod
+    def for_gitdir(cls, gitdir: Path) -> BuildCache:
+        return cls(gitdir / REPO_CACHE_DIRNAME / BUILD_CACHE_DIRNAME)
+
+    def fetch(self, key: str, dest: Path) -> list[Path] | None:
+        """
+        If artifacts are cached under ``key`` and their contents match the
+        digests recorded when they were stored, copy them into ``dest`` and
+        return their new paths; otherwise, return `None`.  Entries that fail
+        verification are deleted.
+        """
+        entry = self.directory / key
+        try:
+            with (entry / MANIFEST_FILENAME).open(encoding="utf-8") as fp:
+                manifest = json.load(fp)
+            assert isinstance(manifest, dict) and manifest
+            for name, digest in manifest.items():
+                if file_digest(entry / name) != digest:
+                    raise ValueError(f"digest of {name} does not match manifest")
+        except FileNotFoundError:
+            return None
+        except (AssertionError, OSError, ValueError) as e:
+            log.debug("Discarding invalid cached build %s: %s", key, e)
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        dest.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name in manifest:
+            log.debug("Copying cached artifact %s", name)
+            paths.append(Path(shutil.copy2(entry / name, dest / name)))
+        # Mark the entry as recently used:
+        os.utime(entry / MANIFEST_FILENAME)
+        return paths
+
+    def store(self, key: str, artifacts: list[Path]) -> None:
+        """Cache copies of ``artifacts`` under ``key``"""
+        if not artifacts:
+            return
+        entry = self.directory / key
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Populate a temporary directory and then move it into place so
+            # that an interrupted store never leaves a partial entry
+            tmp = Path(mkdtemp(dir=self.directory, prefix=f".{key}."))
+            manifest: dict[str, Any] = {}
+            for p in artifacts:
+                shutil.copy2(p, tmp / p.name)
+                manifest[p.name] = file_digest(tmp / p.name)
+            with (tmp / MANIFEST_FILENAME).open("w", encoding="utf-8") as fp:
+                json.dump(manifest, fp)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        except OSError as e:
+            log.debug("Could not cache build artifacts: %s", e)
+            return
+        self.prune()
+
+    def prune(self, size: int = BUILD_CACHE_SIZE) -> None:
+        """Delete all but the ``size`` most recently used entries"""
+        entries = []
+        for p in self.directory.iterdir():
+            if p.name.startswith("."):
+                continue
+            try:
+                mtime = (p / MANIFEST_FILENAME).stat().st_mtime_ns
+            except OSError:
+                mtime = 0
+            entries.append((mtime, p))
+        entries.sort(reverse=True)
+        for _, p in entries[size:]:
+            log.debug("Removing cached build %s", p.name)
+            shutil.rmtree(p, ignore_errors=True)
+
+
+#: Script run inside a build environment to ask the project's build backend
+#: for its dynamic build requirements
+QUERY_REQUIRES_SCRIPT = """\
+import json
+import sys
+from build import ProjectBuilder
+
+builder = ProjectBuilder(sys.argv[1])
+reqs = set()
+for dist in sys.argv[2:]:
+    reqs |= builder.get_requires_for_build(dist)
+print(json.dumps(sorted(reqs)))
+"""
+
+
+def get_build_env(directory: Path, requires: list[str], dists: list[str]) -> Path:
+    """
+    Return the path to the Python interpreter of a cached virtual environment
+    in which the project at ``directory`` can be built with ``python -m build
+    --no-isolation``.  ``requires`` is the project's ``build-system.requires``,
+    and ``dists`` is the list of distribution types to build (``"sdist"``
+    and/or ``"wheel"``).
+
+    An environment with ``requires`` installed is used to ask the build
+    backend for any additional requirements for building ``dists``; if there
+    are any, an environment with both sets of requirements is returned
+    instead.
+    """
+    python = prepare_build_env(requires)
+    dynamic = json.loads(
+        readcmd(python, "-c", QUERY_REQUIRES_SCRIPT, directory, *dists)
+    )
+    if extra := sorted(set(dynamic) - set(requires)):
+        log.debug("Backend requires additional packages: %s", ", ".join(extra))
+        python = prepare_build_env([*requires, *extra])
+    return python
+
+
+def prepare_build_env(requires: list[str]) -> Path:
+    """
+    Return the path to the Python interpreter of a virtual environment in which
+    ``build`` and the build requirements ``requires`` are installed, creating
+    the environment if necessary.  Environments are kept in the user cache
+    directory, keyed by ``requires`` and the current interpreter, and they are
+    recreated after `BUILD_ENV_TTL` (unless pyrepo is offline).
+    """
+    key = sha256(
+        json.dumps(
+            [sys.executable, sys.implementation.cache_tag, sorted(requires)]
+        ).encode("utf-8")
+    ).hexdigest()
+    envdir = get_cache_dir() / BUILD_ENV_DIRNAME / key
+    if os.name == "nt":
+        python = envdir / "Scripts" / "python.exe"
+    else:
+        python = envdir / "bin" / "python"
+    try:
+        age = time.time() - (envdir / BUILD_ENV_MARKER).stat().st_mtime
+    except FileNotFoundError:
+        age = None
+    if age is not None and (is_offline() or age < BUILD_ENV_TTL.total_seconds()):
+        log.debug("Using cached build environment %s", envdir)
+        return python
+    log.info("Preparing build environment for %s ...", ", ".join(requires))
+    # An environment without a marker file was only partially created, so it
+    # is deleted along with expired environments
+    shutil.rmtree(envdir, ignore_errors=True)
+    try:
+        runcmd(sys.executable, "-m", "venv", envdir)
+        runcmd(
+            python,
+            "-m",
+            "pip",
+            "install",
+            "--quiet",
+            "--disable-pip-version-check",
+            "build",
+            *requires,
+        )
+    except BaseException:
+        shutil.rmtree(envdir, ignore_errors=True)
+        raise
+    (envdir / BUILD_ENV_MARKER).touch()
+    return python
@@ -0,0 +1,158 @@
+from __future__ import annotations
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from hashlib import sha256
+import json
+import logging
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any
+from platformdirs import user_cache_path
+from . import __version__
+
+log = logging.getLogger(__name__)
+
+#: Name of the directory inside a repository's Git directory in which
+#: per-repository cache files are stored
+REPO_CACHE_DIRNAME = "pyrepo-cache"
+
+#: Environment variable that can be set to override the location of the user
+#: cache directory
+CACHE_DIR_ENVVAR = "PYREPO_CACHE_DIR"
+
+#: Environment variable that, when set to a nonempty value other than "0",
+#: tells pyrepo to use cached or bundled data instead of fetching it from the
+#: network
+OFFLINE_ENVVAR = "PYREPO_OFFLINE"
+
+
+def get_cache_dir() -> Path:
+    """
+    Return the directory in which pyrepo caches data that is not specific to
+    any one repository
+    """
+    if d := os.environ.get(CACHE_DIR_ENVVAR):
+        return Path(d)
+    else:
+        return user_cache_path("pyrepo")
+
+
+def is_offline() -> bool:
+    """Test whether pyrepo has been told not to access the network"""
+    return os.environ.get(OFFLINE_ENVVAR, "") not in ("", "0")
+
+
+def file_stamp(path: Path) -> tuple[int, int, int] | None:
+    """
+    Return the modification time, size, and inode number of ``path`` for
+    detecting when it changes, or `None` if it does not exist
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def file_digest(path: Path) -> str:
+    """Return the hex SHA256 digest of the contents of ``path``"""
+    hasher = sha256()
+    with path.open("rb") as fp:
+        while chunk := fp.read(65536):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def write_json(path: Path, data: Any, indent: int | None = None) -> None:
+    """
+    Write ``data`` to ``path`` as JSON by writing to a temporary file and then
+    moving it into place, so that concurrent readers never see a
+    partially-written file.  The temporary file is removed if writing fails.
+    """
+    fp = NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=path.parent,
+        prefix=f".{path.name}.",
+        delete=False,
+    )
+    try:
+        with fp:
+            json.dump(data, fp, indent=indent)
+        os.replace(fp.name, path)
+    except BaseException:
+        Path(fp.name).unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class Fingerprint:
+    """
+    A hash of the paths, modification times, and sizes of a set of files, used
+    to detect when any of the files have changed
+    """
+
+    hasher: Any = field(default_factory=sha256)
+
+    def __post_init__(self) -> None:
+        # Data cached by one version of pyrepo may not be valid for another
+        self.add_data(__version__)
+
+    def add_data(self, data: str) -> None:
+        self.hasher.update(data.encode("utf-8") + b"\0")
+
+    def add_file(self, path: Path) -> None:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self.add_data(f"{path}:-")
+        else:
+            self.add_data(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+
+    def add_files(self, paths: Iterable[Path]) -> None:
+        for p in sorted(paths):
+            self.add_file(p)
+
+    def hexdigest(self) -> str:
+        return str(self.hasher.hexdigest())
+
+
+@dataclass
+class CacheFile:
+    """
+    A JSON file storing a single value along with the key (usually a
+    `Fingerprint` digest) that the value is valid for
+    """
+
+    path: Path
+
+    def load(self, key: str) -> Any:
+        """
+        Return the cached value if it was stored under ``key``; otherwise,
+        return `None`
+        """
+        try:
+            with self.path.open(encoding="utf-8") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.debug("Could not read cache file %s: %s", self.path, e)
+            return None
+        if isinstance(data, dict) and data.get("key") == key:
+            log.debug("Using cached data from %s", self.path)
+            return data.get("value")
+        else:
+            return None
+
+    def store(self, key: str, value: Any) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_json(self.path, {"key": key, "value": value})
+        except OSError as e:
+            log.debug("Could not write cache file %s: %s", self.path, e)
+
+
+def repo_cache_file(gitdir: Path, name: str) -> CacheFile:
+    return CacheFile(gitdir / REPO_CACHE_DIRNAME / name)
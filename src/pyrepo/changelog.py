@@ -1,6 +1,7 @@
 from __future__ import annotations
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from datetime import date, datetime
+from io import StringIO
 import re
 from typing import IO, Any
 from .util import join_markup_list, split_markup_list
@@ -16,15 +17,32 @@ class Changelog:
     """
 
     intro: str
+    #: The sections of the changelog, newest first.  If the changelog was
+    #: loaded with ``lazy=True``, this only contains the first section until
+    #: `parse_all()` is called.
     sections: list[ChangelogSection]
+    #: The unparsed text of the sections after the first (starting at the
+    #: second section's header) when loaded with ``lazy=True``
+    _tail: str | None = field(default=None, repr=False, compare=False)
+    #: Whether any section in ``_tail`` contains a blank line (which
+    #: determines how sections are separated), or `None` if this cannot be
+    #: determined without parsing the tail
+    _tail_spacious: bool | None = field(default=None, repr=False, compare=False)
 
     @classmethod
-    def load(cls, fp: IO[str]) -> Changelog:
+    def load(cls, fp: IO[str], lazy: bool = False) -> Changelog:
+        """
+        Parse a changelog from ``fp``.  If ``lazy`` is true, only the intro and
+        the first section are parsed; the rest of the file is kept as-is and
+        is spliced back in unchanged when the changelog is stringified.
+        """
         intro = ""
         prev: str | None = None
         sections: list[ChangelogSection] = []
         for line in fp:
             if re.fullmatch(r"---+\s*", line):
+                if lazy and sections and prev is not None:
+                    return cls._split(intro, sections[0], prev + line + fp.read())
                 if sections:
                     sections[-1]._end()
                 if prev is None:
@@ -87,22 +105,66 @@ class Changelog:
             sections[-1]._end()
         return cls(intro=intro, sections=sections)
 
+    @classmethod
+    def _split(cls, intro: str, head: ChangelogSection, tail: str) -> Changelog:
+        content = head.content
+        head._end()
+        # The newlines between the first section's content and the tail are
+        # the separator used between all sections (if the file was written by
+        # this class); note that the newline at the end of the hrule is not
+        # part of the section content.
+        sep_newlines = content.count("\n", len(head.content))
+        if not head.content:
+            sep_newlines += 1
+        tail_spacious: bool | None
+        if sep_newlines < 3:
+            tail_spacious = False
+        elif "\n\n" not in head.content:
+            tail_spacious = True
+        else:
+            tail_spacious = None
+        return cls(
+            intro=intro, sections=[head], _tail=tail, _tail_spacious=tail_spacious
+        )
+
+    def parse_all(self) -> None:
+        """Parse the rest of a lazily-loaded changelog"""
+        if self._tail is not None:
+            self.sections.extend(Changelog.load(StringIO(self._tail)).sections)
+            self._tail = None
+            self._tail_spacious = None
+
     def dump(self, fp: IO[str]) -> None:
         print(self, file=fp, end="")
 
     def for_json(self) -> dict[str, Any]:
+        self.parse_all()
         data = asdict(self)
+        del data["_tail"], data["_tail_spacious"]
         for sect in data["sections"]:
             if isinstance(sect["release_date"], date):
                 sect["release_date"] = sect["release_date"].isoformat()
         return data
 
     def __str__(self) -> str:
-        if self.sections:
-            if any("\n\n" in sect.content for sect in self.sections):
-                sep = "\n\n\n"
-            else:
-                sep = "\n\n"
+        spacious = any("\n\n" in sect.content for sect in self.sections)
+        if self._tail is not None:
+            if (self._tail_spacious is None and not spacious) or (
+                self._tail_spacious is False and spacious
+            ):
+                # Either it's unknown whether the tail's sections need to be
+                # separated by blank lines, or their separators need to
+                # change, so the tail can't be spliced in as-is.
+                whole = Changelog(
+                    intro=self.intro,
+                    sections=self.sections
+                    + Changelog.load(StringIO(self._tail)).sections,
+                )
+                return str(whole)
+            sep = "\n\n\n" if spacious or self._tail_spacious else "\n\n"
+            return self.intro + sep.join(map(str, self.sections)) + sep + self._tail
+        elif self.sections:
+            sep = "\n\n\n" if spacious else "\n\n"
             return self.intro + sep.join(map(str, self.sections)) + "\n"
         else:
             return self.intro
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from importlib import import_module
 from typing import Any
 import click
 
@@ -35,10 +36,47 @@ class ConfigurableCommand(click.Command):
 class ConfigurableGroup(ConfigurableCommand, click.Group):
     def process_config(self, cfg: dict[str, Any]) -> dict[str, Any]:
         out_cfg = super().process_config(cfg)
-        for cmdname, cmdobj in self.commands.items():
+        for cmdname, c in cfg.items():
             ### TODO: Warn or error on non-dict values?
-            if isinstance(cmdobj, ConfigurableCommand) and isinstance(
-                c := cfg.get(cmdname), dict
+            if isinstance(c, dict) and isinstance(
+                cmdobj := self.lookup_command(cmdname), ConfigurableCommand
             ):
                 out_cfg[cmdname] = cmdobj.process_config(c)
         return out_cfg
+
+    def lookup_command(self, cmd_name: str) -> click.Command | None:
+        return self.commands.get(cmd_name)
+
+
+class LazyConfigurableGroup(ConfigurableGroup):
+    """
+    A `ConfigurableGroup` that is additionally given a mapping from subcommand
+    names to ``"module:attribute"`` import paths; the module for a subcommand
+    is only imported once the subcommand is actually looked up.
+
+    `process_config()` only loads those subcommands that have tables in the
+    configuration.
+    """
+
+    def __init__(
+        self, lazy_commands: dict[str, str] | None = None, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, _ctx: click.Context, cmd_name: str) -> click.Command | None:
+        return self.lookup_command(cmd_name)
+
+    def lookup_command(self, cmd_name: str) -> click.Command | None:
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            modname, _, attr = self.lazy_commands[cmd_name].partition(":")
+            cmdobj = getattr(import_module(modname), attr)
+            if not isinstance(cmdobj, click.Command):
+                raise TypeError(
+                    f"{self.lazy_commands[cmd_name]} is not a Click command"
+                )
+            self.add_command(cmdobj, cmd_name)
+        return super().lookup_command(cmd_name)
@@ -1,12 +1,92 @@
+from __future__ import annotations
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import json
+from pathlib import Path
+import sys
+from typing import Any, TextIO
 import click
+from ..details import ProjectDetails
 from ..project import Project, with_project
-from ..util import cpe_no_tb
+from ..util import cpe_no_tb, yield_lines
 
 
 @click.command()
-@with_project
+@click.option(
+    "-F",
+    "--from-file",
+    type=click.File(encoding="utf-8"),
+    help="Also inspect the projects whose directories are listed in FILE",
+    metavar="FILE",
+)
+@click.option(
+    "-J",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Number of projects to inspect in parallel  [default: number of CPUs]",
+    metavar="INT",
+)
+@click.argument(
+    "dirpath",
+    nargs=-1,
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+)
 @cpe_no_tb
-def cli(project: Project) -> None:
-    """Extract template variables from a project"""
+def cli(dirpath: tuple[Path, ...], from_file: TextIO | None, jobs: int | None) -> None:
+    """Extract template variables from one or more projects"""
+    if not dirpath and from_file is None:
+        show_project()
+        return
+    dirpaths = list(dirpath)
+    if from_file is not None:
+        dirpaths.extend(map(Path, yield_lines(from_file)))
+    ok = True
+    for record in inspect_projects(dirpaths, jobs):
+        click.echo(json.dumps(record, sort_keys=True))
+        ok = ok and "error" not in record
+    if not ok:
+        sys.exit(1)
+
+
+@with_project
+def show_project(project: Project) -> None:
     click.echo(json.dumps(project.details.for_json(), indent=4, sort_keys=True))
+
+
+def inspect_projects(
+    dirpaths: list[Path], jobs: int | None = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Inspect the projects at ``dirpaths`` using a pool of ``jobs`` processes and
+    yield a record for each one as soon as it is ready.  When ``jobs`` is 1,
+    the projects are inspected one at a time in the current process.
+    """
+    if jobs == 1:
+        for p in dirpaths:
+            yield inspect_project(p)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(inspect_project, p): p for p in dirpaths}
+        for fut in as_completed(futures):
+            try:
+                yield fut.result()
+            except Exception as e:
+                # The worker process died
+                yield error_record(futures[fut], e)
+
+
+def inspect_project(dirpath: Path) -> dict[str, Any]:
+    """
+    Inspect the project at ``dirpath`` and return a record of either the
+    details or the error that occurred
+    """
+    try:
+        details = ProjectDetails.inspect(dirpath)
+    except Exception as e:
+        return error_record(dirpath, e)
+    else:
+        return {"path": str(dirpath), "details": details.for_json()}
+
+
+def error_record(dirpath: Path, e: Exception) -> dict[str, Any]:
+    return {"path": str(dirpath), "error": f"{type(e).__name__}: {e}"}
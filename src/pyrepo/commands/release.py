@@ -12,10 +12,13 @@
 # - There is no CHANGELOG file until after the initial release has been made.
 
 from __future__ import annotations
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from datetime import date
 from functools import partial
+from io import StringIO
+import json
 import logging
 from mimetypes import add_type, guess_type
 import os
@@ -24,22 +27,26 @@ from pathlib import Path
 import re
 import sys
 from tempfile import NamedTemporaryFile
+import threading
+from typing import Any
 import click
 from ghreq import Endpoint
-from in_place import InPlace
 from linesep import read_paragraphs
 from packaging.version import Version
 from uritemplate import expand
+from ..cache import file_digest, write_json
 from ..clack import ConfigurableCommand
 from ..gh import GitHub
+from ..git import find_git_dir
 from ..project import Project, with_project
+from ..steps import Step, run_steps
 from ..util import (
     Bump,
+    LineRewriter,
+    LineRule,
     bump_version,
     cpe_no_tb,
     ensure_license_years,
-    map_lines,
-    replace_group,
     runcmd,
     update_years2str,
 )
@@ -53,6 +60,110 @@ ACTIVE_BADGE = """\
           state and is being actively developed.
 """
 
+DOCS_COPYRIGHT_RGX = re.compile(r'^copyright\s*=\s*[\x27"](\d[-,\d\s]+\d) \w+')
+
+#: Maximum number of assets to upload to a GitHub release at once
+GITHUB_UPLOAD_JOBS = 4
+
+#: Name of the file in the Git directory in which the progress of a release
+#: is recorded
+JOURNAL_FILENAME = "pyrepo-release.json"
+
+
+class UploadError(click.ClickException):
+    """Raised when one or more release artifacts could not be uploaded"""
+
+    def __init__(self, failures: list[str]) -> None:
+        self.failures = failures
+        super().__init__("Failed to upload: " + ", ".join(failures))
+
+
+@dataclass
+class ReleaseJournal:
+    """
+    A record of the progress of a release, saved after each step so that an
+    interrupted release can be picked up again with ``pyrepo release
+    --resume``
+    """
+
+    path: Path
+    version: str
+    use_next_version: bool = True
+    #: Names of the release steps that have been completed
+    completed: list[str] = field(default_factory=list)
+    #: Mapping from paths of built artifacts to their SHA256 digests
+    assets: dict[str, str] = field(default_factory=dict)
+    release_upload_url: str | None = None
+    #: Names of the artifacts that have been uploaded to the GitHub release
+    github_uploaded: list[str] = field(default_factory=list)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    @staticmethod
+    def get_path(project: Project) -> Path:
+        """Return the path at which the journal for ``project`` is stored"""
+        gitdir = find_git_dir(project.directory)
+        if gitdir is None:
+            gitdir = Path(project.repo.read("rev-parse", "--absolute-git-dir"))
+        return gitdir / JOURNAL_FILENAME
+
+    @classmethod
+    def load(cls, path: Path) -> ReleaseJournal | None:
+        try:
+            with path.open(encoding="utf-8") as fp:
+                data = json.load(fp)
+            return cls(path=path, **data)
+        except FileNotFoundError:
+            return None
+        except (TypeError, ValueError) as e:
+            raise click.ClickException(
+                f"Invalid release journal {path}: {e}; run without --resume to"
+                " start the release over"
+            )
+
+    def save(self) -> None:
+        with self._lock:
+            data = {
+                "version": self.version,
+                "use_next_version": self.use_next_version,
+                "completed": self.completed,
+                "assets": self.assets,
+                "release_upload_url": self.release_upload_url,
+                "github_uploaded": self.github_uploaded,
+            }
+            write_json(self.path, data, indent=4)
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+    def complete(self, step: str) -> None:
+        with self._lock:
+            self.completed.append(step)
+        self.save()
+
+    def set_assets(self, assets: list[Path]) -> None:
+        self.assets = {str(p): file_digest(p) for p in assets}
+        self.save()
+
+    def get_assets(self) -> list[Path] | None:
+        """
+        Return the recorded artifacts, or `None` if any of them are missing or
+        have changed since they were built
+        """
+        assets = []
+        for path, digest in self.assets.items():
+            p = Path(path)
+            if not p.is_file() or file_digest(p) != digest:
+                return None
+            assets.append(p)
+        return assets
+
+    def record_github_upload(self, name: str) -> None:
+        with self._lock:
+            self.github_uploaded.append(name)
+        self.save()
+
 
 @dataclass
 class Releaser:
@@ -62,6 +173,7 @@ class Releaser:
     tox: bool
     assets: list[Path] = field(default_factory=list)
     release_upload_url: str | None = None
+    journal: ReleaseJournal | None = None
 
     @classmethod
     def from_project(
@@ -70,6 +182,7 @@ class Releaser:
         gh: GitHub,
         version: str,
         tox: bool = False,
+        journal: ReleaseJournal | None = None,
     ) -> Releaser:
         return cls(
             project=project,
@@ -79,23 +192,101 @@ class Releaser:
             / project.details.github_user
             / project.details.repo_name,
             tox=tox,
+            journal=journal,
         )
 
-    def run(self, use_next_version: bool = True) -> None:
-        self.end_dev()
+    def run(self, use_next_version: bool = True, serial: bool = False) -> None:
+        """
+        Perform the release.  Steps that do not depend on each other are run
+        concurrently unless ``serial`` is true.
+        """
+        if self.journal is not None:
+            self.restore()
+        run_steps(self.get_steps(use_next_version), serial=serial)
+        if self.journal is not None:
+            self.journal.discard()
+
+    def get_steps(self, use_next_version: bool = True) -> list[Step]:
+        """
+        Return the steps of the release along with their dependencies, in the
+        order in which they are run when running serially
+        """
+        steps = [Step("end_dev", self.end_dev)]
+        # Steps that must succeed before committing
+        checks = []
         if self.tox:
-            self.tox_check()
-        if not self.project.details.uses_versioningit:
-            self.build()
-            self.twine_check()
-        self.commit_version()
+            steps.append(Step("tox", self.tox_check, ["end_dev"]))
+            checks.append("tox")
         if self.project.details.uses_versioningit:
-            self.build()
-            self.twine_check()
-        self.project.repo.run("push", "--follow-tags")
-        self.mkghrelease()
-        self.upload()
-        self.project.begin_dev(use_next_version)  # Not idempotent
+            # The version is determined from the tag, so the commit must come
+            # before the build.
+            steps.extend(
+                [
+                    Step("commit", self.commit_version, ["end_dev", *checks]),
+                    Step("build", self.build, ["commit"]),
+                    Step("twine_check", self.twine_check, ["build"]),
+                ]
+            )
+        else:
+            steps.extend(
+                [
+                    Step("build", self.build, ["end_dev"]),
+                    Step("twine_check", self.twine_check, ["build"]),
+                    Step(
+                        "commit",
+                        self.commit_version,
+                        ["end_dev", "twine_check", *checks],
+                    ),
+                ]
+            )
+        steps.extend(
+            [
+                Step("push", self.push, ["commit"]),
+                Step("github_release", self.mkghrelease, ["push"]),
+                Step("upload_pypi", self.upload_pypi, ["push", "twine_check"]),
+                Step(
+                    "upload_github",
+                    self.upload_github,
+                    ["github_release", "twine_check"],
+                ),
+                Step(
+                    "begin_dev",
+                    partial(self.project.begin_dev, use_next_version),
+                    ["upload_pypi", "upload_github"],
+                ),
+            ]
+        )
+        return [Step(s.name, partial(self.step, s.name, s.func), s.deps) for s in steps]
+
+    def step(self, name: str, func: Callable[[], Any]) -> None:
+        """
+        Run the release step ``func`` unless the journal says it was already
+        completed, and then record it as completed
+        """
+        if self.journal is not None and name in self.journal.completed:
+            log.info("Skipping step %r, which was already completed", name)
+            return
+        func()
+        if self.journal is not None:
+            self.journal.complete(name)
+
+    def restore(self) -> None:
+        """Restore the state of a resumed release from the journal"""
+        assert self.journal is not None
+        self.release_upload_url = self.journal.release_upload_url
+        if "build" in self.journal.completed:
+            if (assets := self.journal.get_assets()) is not None:
+                log.info("Reusing previously-built artifacts")
+                self.assets = assets
+            else:
+                log.warning(
+                    "Previously-built artifacts are missing or modified;" " rebuilding"
+                )
+                self.journal.completed = [
+                    s
+                    for s in self.journal.completed
+                    if s not in ("build", "twine_check")
+                ]
 
     def tox_check(self) -> None:  # Idempotent
         if (self.project.directory / "tox.ini").exists():
@@ -146,12 +337,7 @@ class Releaser:
 
     def mkghrelease(self) -> None:  ### Not idempotent
         log.info("Creating GitHub release ...")
-        subject, body = self.project.repo.read(
-            "show",
-            "-s",
-            "--format=%s%x00%b",
-            f"v{self.version}^{{commit}}",
-        ).split("\0", 1)
+        subject, body = self.project.repo.get_commit_message(f"v{self.version}")
         reldata = (self.ghrepo / "releases").post(
             {
                 "tag_name": f"v{self.version}",
@@ -161,19 +347,21 @@ class Releaser:
             }
         )
         self.release_upload_url = reldata["upload_url"]
+        if self.journal is not None:
+            self.journal.release_upload_url = self.release_upload_url
+
+    def push(self) -> None:  # Idempotent
+        self.project.repo.run("push", "--follow-tags")
 
     def build(self) -> None:  ### Not idempotent
         log.info("Building artifacts ...")
         self.project.build(clean=True)
         self.assets = list((self.project.directory / "dist").iterdir())
-
-    def upload(self) -> None:
-        log.info("Uploading artifacts ...")
-        assert self.assets, "Nothing to upload"
-        self.upload_pypi()
-        self.upload_github()
+        if self.journal is not None:
+            self.journal.set_assets(self.assets)
 
     def upload_pypi(self) -> None:  # Idempotent
+        assert self.assets, "Nothing to upload"
         if self.project.private:
             log.info("Private project; not uploading to PyPI")
         else:
@@ -192,13 +380,38 @@ class Releaser:
         assert (
             self.release_upload_url is not None
         ), "Cannot upload to GitHub before creating release"
-        for asset in self.assets:
-            url = expand(self.release_upload_url, name=asset.name)
-            with asset.open("rb") as fp:
-                (self.ghrepo / url).post(
-                    headers={"Content-Type": get_mime_type(asset.name)},
-                    data=fp,
-                )
+        assert self.assets, "Nothing to upload"
+        failures: list[str] = []
+        with ThreadPoolExecutor(max_workers=GITHUB_UPLOAD_JOBS) as pool:
+            futures = {
+                pool.submit(self.upload_github_asset, asset): asset
+                for asset in self.assets
+            }
+            for fut in as_completed(futures):
+                asset = futures[fut]
+                try:
+                    fut.result()
+                except Exception as e:
+                    log.error("Failed to upload %s to GitHub: %s", asset.name, e)
+                    failures.append(f"{asset.name} (GitHub)")
+                else:
+                    log.info("Uploaded %s to GitHub", asset.name)
+        if failures:
+            raise UploadError(failures)
+
+    def upload_github_asset(self, asset: Path) -> None:
+        assert self.release_upload_url is not None
+        if self.journal is not None and asset.name in self.journal.github_uploaded:
+            log.info("%s was already uploaded to GitHub", asset.name)
+            return
+        url = expand(self.release_upload_url, name=asset.name)
+        with asset.open("rb") as fp:
+            (self.ghrepo / url).post(
+                headers={"Content-Type": get_mime_type(asset.name)},
+                data=fp,
+            )
+        if self.journal is not None:
+            self.journal.record_github_upload(asset.name)
 
     def end_dev(self) -> None:  # Idempotent
         log.info("Finalizing version ...")
@@ -222,14 +435,13 @@ class Releaser:
         docs_conf = self.project.directory / "docs" / "conf.py"
         if docs_conf.exists():
             log.info("Ensuring docs/conf.py copyright is up to date ...")
-            map_lines(
-                docs_conf,
-                partial(
-                    replace_group,
-                    r'^copyright\s*=\s*[\x27"](\d[-,\d\s]+\d) \w+',
-                    lambda ys: update_years2str(ys, years),
-                ),
-            )
+            LineRewriter(
+                [
+                    LineRule.replace_group(
+                        DOCS_COPYRIGHT_RGX, lambda ys: update_years2str(ys, years)
+                    )
+                ]
+            ).rewrite_file(docs_conf)
         if self.project.get_changelog() is None:
             # Initial release
             self.end_initial_dev()
@@ -238,20 +450,19 @@ class Releaser:
         # Set repostatus to "Active":
         log.info("Advancing repostatus ...")
         ### TODO: Use the Readme class for this:
-        with InPlace(
-            self.project.directory / "README.rst",
-            mode="t",
-            encoding="utf-8",
-        ) as fp:
-            for para in read_paragraphs(fp):
+        readme = self.project.directory / "README.rst"
+        with self.project.transaction() as tx:
+            paras = []
+            for para in read_paragraphs(StringIO(tx.read(readme))):
                 if re.fullmatch(
                     r"\.\. \|repostatus\| image::"
                     r" https?://www\.repostatus\.org/badges/latest/wip\.svg",
                     para.splitlines()[0],
                 ):
-                    print(ACTIVE_BADGE, file=fp)
+                    paras.append(ACTIVE_BADGE + "\n")
                 else:
-                    print(para, file=fp, end="")
+                    paras.append(para)
+            tx.write(readme, "".join(paras))
         if not self.project.private:
             log.info("Updating GitHub topics ...")
             ### TODO: Check that the repository has topics first?
@@ -271,6 +482,16 @@ class Releaser:
 
 @click.command(cls=ConfigurableCommand, allow_config=["tox"])
 @click.option("--tox/--no-tox", help="Run tox before building")
+@click.option(
+    "--serial",
+    is_flag=True,
+    help="Run the release steps one at a time instead of concurrently",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume an interrupted release, skipping the steps already completed",
+)
 @click.option(
     "--major",
     "bump",
@@ -316,35 +537,67 @@ class Releaser:
 @click.argument("version", required=False)
 @with_project
 @cpe_no_tb
-def cli(project: Project, version: str | None, tox: bool, bump: Bump | None) -> None:
+def cli(
+    project: Project,
+    version: str | None,
+    tox: bool,
+    bump: Bump | None,
+    resume: bool,
+    serial: bool,
+) -> None:
     """Make a new release of the project"""
-    if bump is not None:
-        if version is not None:
+    journal_path = ReleaseJournal.get_path(project)
+    if resume:
+        if version is not None or bump is not None:
             raise click.UsageError(
-                "Explicit version and version bump options are mutually exclusive"
+                "--resume is mutually exclusive with explicit versions and"
+                " version bump options"
             )
-        last_tag = project.repo.get_latest_tag()
-        if last_tag is None:
-            if bump is Bump.DATE:
-                last_tag = "1970.1.1"
-            else:
+        journal = ReleaseJournal.load(journal_path)
+        if journal is None:
+            raise click.UsageError("No interrupted release to resume")
+        log.info("Resuming release of v%s ...", journal.version)
+    else:
+        if bump is not None:
+            if version is not None:
                 raise click.UsageError(
-                    "Cannot use version bump options when there are no tags"
+                    "Explicit version and version bump options are mutually"
+                    " exclusive"
                 )
-        version = bump_version(last_tag, bump)
-    elif version is None:
-        if project.details.uses_versioningit:
-            raise click.UsageError(
-                "Project uses versioningit; explicit version or version bump"
-                " option required"
-            )
-        # Remove prerelease & dev release from __version__
-        version = Version(project.details.version).base_version
+            last_tag = project.repo.get_latest_tag()
+            if last_tag is None:
+                if bump is Bump.DATE:
+                    last_tag = "1970.1.1"
+                else:
+                    raise click.UsageError(
+                        "Cannot use version bump options when there are no tags"
+                    )
+            version = bump_version(last_tag, bump)
+        elif version is None:
+            if project.details.uses_versioningit:
+                raise click.UsageError(
+                    "Project uses versioningit; explicit version or version bump"
+                    " option required"
+                )
+            # Remove prerelease & dev release from __version__
+            version = Version(project.details.version).base_version
+        if journal_path.exists():
+            log.warning("Discarding record of previous interrupted release")
+        journal = ReleaseJournal(
+            path=journal_path,
+            version=version.lstrip("v"),
+            use_next_version=bump is not Bump.DATE,
+        )
+        journal.save()
     add_type("application/zip", ".whl", False)
     with GitHub() as gh:
-        Releaser.from_project(project=project, version=version, gh=gh, tox=tox).run(
-            use_next_version=bump is not Bump.DATE
-        )
+        Releaser.from_project(
+            project=project,
+            version=journal.version,
+            gh=gh,
+            tox=tox,
+            journal=journal,
+        ).run(use_next_version=journal.use_next_version, serial=serial)
 
 
 def get_mime_type(filename: str, strict: bool = False) -> str:
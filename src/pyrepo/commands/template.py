@@ -1,24 +1,69 @@
 from __future__ import annotations
+import logging
+import sys
 from typing import TextIO
 import click
 from ..project import Project, with_project
 from ..util import cpe_no_tb
 
+log = logging.getLogger(__name__)
+
 
 @click.command()
+@click.option(
+    "-a",
+    "--all",
+    "all_templates",
+    is_flag=True,
+    help="Re-evaluate all of the templates that apply to the project",
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Don't write anything; exit nonzero if any files are out of date",
+)
+@click.option(
+    "--diff",
+    is_flag=True,
+    help="Don't write anything; output diffs for files that are out of date",
+)
 @click.option("-o", "--outfile", type=click.File("w", encoding="utf-8"))
 @click.argument("template", nargs=-1)
 @with_project
 @cpe_no_tb
-def cli(project: Project, template: tuple[str, ...], outfile: TextIO | None) -> None:
+def cli(
+    project: Project,
+    template: tuple[str, ...],
+    outfile: TextIO | None,
+    all_templates: bool,
+    check: bool,
+    diff: bool,
+) -> None:
     """Replace files with their re-evaluated templates"""
     twriter = project.get_template_writer()
     if outfile is not None:
-        if len(template) != 1:
+        if len(template) != 1 or all_templates or check or diff:
             raise click.UsageError(
                 "--outfile may only be used with a single template argument"
             )
         print(twriter.render(template[0]), end="", file=outfile)
+        return
+    if all_templates:
+        if template:
+            raise click.UsageError("--all cannot be used with template arguments")
+        templates = project.get_managed_templates()
+    else:
+        templates = list(template)
+    if check or diff:
+        outdated = False
+        for tmplt in templates:
+            if d := twriter.diff(tmplt):
+                outdated = True
+                log.info("File %s is out of date", tmplt)
+                if diff:
+                    click.echo(d, nl=False)
+        if check and outdated:
+            sys.exit(1)
     else:
-        for tmplt in template:
+        for tmplt in templates:
             twriter.write(tmplt)
@@ -1,31 +1,42 @@
 from __future__ import annotations
+from collections.abc import Callable
 from configparser import ConfigParser
+from copy import deepcopy
 from dataclasses import asdict, dataclass
-import json
+import logging
 from pathlib import Path
 import re
-import sys
 from typing import Any
 from intspan import intspan
 from packaging.specifiers import SpecifierSet
 from . import git  # Import module to keep mocking easy
-from .inspecting import InvalidProjectError, parse_extra_testenvs
+from .cache import Fingerprint, repo_cache_file
+from .inspecting import (
+    DOCTEST_RGX,
+    METADATA_FIELDS,
+    InvalidProjectError,
+    get_project_metadata,
+    parse_extra_testenvs,
+    scan_doctests,
+)
+from .pyproject import PyProject
 from .readme import Readme
 from .tmpltr import Templater
-from .util import PyVersion, readcmd, sort_specifier
+from .util import Deferred, LazyField, PyVersion, sort_specifier
 
-if sys.version_info[:2] >= (3, 11):
-    from tomllib import load as toml_load
-else:
-    from tomli import load as toml_load
+# Cached doctest scan results remain valid for as long as the regex used to
+# find doctests stays the same
+DOCTEST_CACHE_KEY = DOCTEST_RGX.pattern.decode("utf-8")
 
+log = logging.getLogger(__name__)
 
-@dataclass
+
+@dataclass(kw_only=True)
 class ProjectDetails:
     #: The name of the project as it is/will be known on PyPI
     name: str
 
-    version: str
+    version: LazyField[str] = LazyField()
     short_description: str
     author: str
     author_email: str
@@ -36,7 +47,7 @@ class ProjectDetails:
 
     #: Extra testenvs to include runs for in CI, as a mapping from testenv name
     #: to Python version
-    extra_testenvs: dict[str, str]
+    extra_testenvs: LazyField[dict[str, str]] = LazyField()
 
     is_flat_module: bool
     import_name: str
@@ -56,43 +67,146 @@ class ProjectDetails:
     rtfd_name: str
     has_tests: bool
     has_typing: bool
-    has_doctests: bool
+    has_doctests: LazyField[bool] = LazyField()
     has_docs: bool
     has_ci: bool
     has_pypi: bool
     copyright_years: list[int]
-    default_branch: str
+    default_branch: LazyField[str] = LazyField()
 
     def __post_init__(self) -> None:
         self.python_versions.sort()
 
     @classmethod
-    def inspect(cls, dirpath: str | Path | None = None) -> ProjectDetails:
-        """Fetch various information about an already-initialized project"""
+    def inspect(
+        cls,
+        dirpath: str | Path | None = None,
+        use_cache: bool = True,
+        pyproject: PyProject | None = None,
+    ) -> ProjectDetails:
+        """
+        Fetch various information about an already-initialized project.  The
+        fields that are expensive to determine (those declared with
+        `LazyField`) are only computed when first accessed.
+
+        If ``use_cache`` is true and the project is the root of a Git
+        repository, the results are cached inside the Git directory and reused
+        until any of the files that they are derived from change.
+
+        ``pyproject`` is the project's :file:`pyproject.toml`; it is passed in
+        by `Project` so that the file is parsed only once for both inspection
+        and editing.
+        """
         if dirpath is None:
             directory = Path()
         else:
             directory = Path(dirpath)
+        if pyproject is None:
+            pyproject = PyProject(directory / "pyproject.toml")
+        gitdir = git.find_git_dir(directory) if use_cache else None
+        if gitdir is None:
+            fields = cls._inspect(directory, pyproject)
+            for name, func in cls._lazy_inspectors(directory, None, pyproject).items():
+                fields[name] = Deferred(func)
+            return cls.from_json(fields)
+
+        cache = repo_cache_file(gitdir, "details.json")
+        key = fingerprint_inputs(directory, gitdir)
+
+        def from_record(record: dict[str, Any]) -> ProjectDetails:
+            def caching(
+                name: str, func: Callable[[ProjectDetails], Any]
+            ) -> Callable[[ProjectDetails], Any]:
+                def wrapped(details: ProjectDetails) -> Any:
+                    value = func(details)
+                    # Don't cache values computed after the project was modified
+                    if fingerprint_inputs(directory, gitdir) == key:
+                        # Store a snapshot, as the value may later be modified
+                        # in place (e.g., by `Project.add_ci_testenv()`)
+                        record[name] = deepcopy(value)
+                        cache.store(key, record)
+                    return value
+
+                return wrapped
+
+            # Don't let the details share mutable values with the record
+            fields = deepcopy(record)
+            lazy = cls._lazy_inspectors(directory, gitdir, pyproject)
+            for name, func in lazy.items():
+                if name in record:
+                    continue
+                elif name == "version" and record["uses_versioningit"]:
+                    # The version also depends on whether the working tree is
+                    # dirty, which cannot be detected by the fingerprint, so
+                    # never cache it.
+                    fields[name] = Deferred(func)
+                else:
+                    fields[name] = Deferred(caching(name, func))
+            return cls.from_json(fields)
+
+        if (record := cache.load(key)) is not None:
+            try:
+                return from_record(record)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                log.debug("Discarding invalid cached project details: %s", e)
+        record = cls._inspect(directory, pyproject)
+        cache.store(key, record)
+        return from_record(record)
+
+    @staticmethod
+    def _lazy_inspectors(
+        directory: Path, gitdir: Path | None, pyproject: PyProject
+    ) -> dict[str, Callable[[ProjectDetails], Any]]:
+        """
+        Return functions for computing the lazy fields of the project in
+        ``directory`` from the `ProjectDetails` that they belong to
+        """
+
+        def get_version(_details: ProjectDetails) -> str:
+            pyproj = pyproject.data()
+            return str(get_project_metadata(directory, pyproj, ["version"])["version"])
+
+        def get_has_doctests(details: ProjectDetails) -> bool:
+            if details.is_flat_module:
+                pyfiles = [directory / f"{details.import_name}.py"]
+            else:
+                pyfiles = list((directory / "src").rglob("*.py"))
+            if gitdir is not None:
+                doctest_cache = repo_cache_file(gitdir, "doctests.json")
+                scanned = doctest_cache.load(DOCTEST_CACHE_KEY) or {}
+                found = scan_doctests(pyfiles, cache=scanned)
+                doctest_cache.store(DOCTEST_CACHE_KEY, scanned)
+                return found
+            else:
+                return scan_doctests(pyfiles)
+
+        def get_extra_testenvs(_details: ProjectDetails) -> dict[str, str]:
+            return parse_extra_testenvs(
+                directory / ".github" / "workflows" / "test.yml"
+            )
+
+        def get_default_branch(_details: ProjectDetails) -> str:
+            return git.Git(dirpath=directory).get_default_branch()
+
+        return {
+            "version": get_version,
+            "has_doctests": get_has_doctests,
+            "extra_testenvs": get_extra_testenvs,
+            "default_branch": get_default_branch,
+        }
+
+    @staticmethod
+    def _inspect(directory: Path, pyproject: PyProject) -> dict[str, Any]:
+        """Compute the non-lazy fields of the project in ``directory``"""
 
         def exists(*fname: str) -> bool:
             return Path(directory, *fname).exists()
 
-        try:
-            with (directory / "pyproject.toml").open("rb") as bf:
-                pyproj = toml_load(bf)
-        except FileNotFoundError:
-            raise InvalidProjectError("Project is missing pyproject.toml file")
-
-        metadata = json.loads(
-            readcmd(sys.executable, "-m", "hatch", "project", "metadata", cwd=dirpath)
+        pyproj = pyproject.data()
+        metadata = get_project_metadata(
+            directory, pyproj, [f for f in METADATA_FIELDS if f != "version"]
         )
-
-        # `hatch project metadata` normalizes the name, so get it directly from
-        # the source
         project_name = pyproj["project"]["name"]
-
-        # `hatch project metadata` sorts classifiers, so get them directly from
-        # the source instead to preserve order:
         classifiers = pyproj["project"].get("classifiers", [])
 
         try:
@@ -145,16 +259,6 @@ class ProjectDetails:
         toxcfg.read(directory / "tox.ini")  # No-op when tox.ini doesn't exist
         has_tests = toxcfg.has_section("testenv")
 
-        has_doctests = False
-        if is_flat_module:
-            pyfiles = [directory / f"{import_name}.py"]
-        else:
-            pyfiles = list((directory / "src").rglob("*.py"))
-        has_doctests = any(
-            re.search(r"^\s*>>>\s+", p.read_text(encoding="utf-8"), flags=re.M)
-            for p in pyfiles
-        )
-
         has_typing = exists("src", import_name, "py.typed")
         has_ci = exists(".github", "workflows", "test.yml")
         has_docs = exists("docs", "index.rst")
@@ -175,23 +279,17 @@ class ProjectDetails:
             else:
                 raise InvalidProjectError("Copyright years not found in LICENSE")
 
-        extra_testenvs = parse_extra_testenvs(
-            directory / ".github" / "workflows" / "test.yml"
-        )
-
-        return cls(
+        return dict(
             name=project_name,
             short_description=metadata["description"],
             author=metadata["authors"][0]["name"],
             author_email=metadata["authors"][0]["email"],
             python_requires=sort_specifier(SpecifierSet(metadata["requires-python"])),
             install_requires=metadata.get("dependencies", []),
-            version=metadata["version"],
             keywords=metadata.get("keywords", []),
             classifiers=classifiers,
             python_versions=python_versions,
             supports_pypy=supports_pypy,
-            default_branch=git.Git(dirpath=directory).get_default_branch(),
             uses_versioningit=uses_versioningit,
             is_flat_module=is_flat_module,
             import_name=import_name,
@@ -200,13 +298,11 @@ class ProjectDetails:
             repo_name=repo_name,
             rtfd_name=rtfd_name,
             has_tests=has_tests,
-            has_doctests=has_doctests,
             has_typing=has_typing,
             has_ci=has_ci,
             has_docs=has_docs,
             has_pypi=has_pypi,
             copyright_years=copyright_years,
-            extra_testenvs=extra_testenvs,
         )
 
     def get_templater(self) -> Templater:
@@ -214,3 +310,45 @@ class ProjectDetails:
 
     def for_json(self) -> dict[str, Any]:
         return asdict(self)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> ProjectDetails:
+        """Construct a `ProjectDetails` from the output of `for_json()`"""
+        data = dict(data)
+        data["python_versions"] = list(map(PyVersion.parse, data["python_versions"]))
+        return cls(**data)
+
+
+def fingerprint_inputs(directory: Path, gitdir: Path) -> str:
+    """
+    Compute a `Fingerprint` of all files that `ProjectDetails.inspect()` reads
+    or checks for the existence of, plus the Git state that it depends on
+    """
+    fp = Fingerprint()
+    fp.add_data(str(directory.resolve()))
+    fp.add_files(
+        [
+            directory / "pyproject.toml",
+            directory / "tox.ini",
+            directory / "README.rst",
+            directory / "LICENSE",
+            directory / ".github" / "workflows" / "test.yml",
+            directory / "docs" / "index.rst",
+            directory / "src",
+        ]
+    )
+    if (directory / "src").is_dir():
+        fp.add_files((directory / "src").iterdir())
+        fp.add_files((directory / "src").rglob("*.py"))
+        fp.add_files((directory / "src").glob("*/py.typed"))
+    else:
+        fp.add_files(directory.glob("*.py"))
+    # The default branch is determined from the list of local branches.
+    # (versioningit versions also depend on HEAD, the tags, and the index, but
+    # they are never cached.)
+    commondir = git.find_common_dir(gitdir)
+    fp.add_file(commondir / "packed-refs")
+    fp.add_files(p for p in (commondir / "refs" / "heads").rglob("*") if p.is_file())
+    if (commondir / "reftable").is_dir():
+        fp.add_files((commondir / "reftable").iterdir())
+    return fp.hexdigest()
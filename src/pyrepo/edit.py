@@ -0,0 +1,126 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import logging
+import os
+from pathlib import Path
+import shutil
+from tempfile import NamedTemporaryFile
+from linesep import ascii_splitlines
+from .util import LineRewriter
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class EditTransaction:
+    """
+    A set of pending changes to files.  Reads see the pending changes, and
+    nothing is written to disk until `commit()` is called, at which point each
+    modified file is written once (existing files via an atomic rename).  If
+    writing any file fails, the files already written are restored to their
+    original contents.
+    """
+
+    #: Mapping from paths to their original contents (`None` for nonexistent
+    #: files), populated when a path is first accessed
+    originals: dict[Path, str | None] = field(default_factory=dict)
+    #: Mapping from paths to their pending contents (`None` for deleted files)
+    pending: dict[Path, str | None] = field(default_factory=dict)
+
+    def _load(self, path: Path) -> str | None:
+        if path in self.pending:
+            return self.pending[path]
+        if path not in self.originals:
+            try:
+                with path.open(encoding="utf-8") as fp:
+                    self.originals[path] = fp.read()
+            except FileNotFoundError:
+                self.originals[path] = None
+        return self.originals[path]
+
+    def exists(self, path: Path) -> bool:
+        if path in self.pending or path in self.originals:
+            return self._load(path) is not None
+        else:
+            # Don't read the file just to check whether it exists
+            return path.exists()
+
+    def read(self, path: Path) -> str:
+        content = self._load(path)
+        if content is None:
+            raise FileNotFoundError(f"No such file: {path}")
+        return content
+
+    def write(self, path: Path, content: str) -> None:
+        self._load(path)
+        self.pending[path] = content
+
+    def delete(self, path: Path) -> None:
+        self.read(path)
+        self.pending[path] = None
+
+    def move(self, src: Path, dest: Path) -> None:
+        self.write(dest, self.read(src))
+        self.delete(src)
+
+    def rewrite(self, path: Path, rewriter: LineRewriter) -> None:
+        self.write(path, "".join(rewriter.rewrite(self.readlines(path))))
+        rewriter.log_counts(path)
+
+    def readlines(self, path: Path) -> list[str]:
+        return ascii_splitlines(self.read(path), keepends=True)
+
+    def get_changes(self) -> dict[Path, str | None]:
+        """Return the pending changes that differ from the files on disk"""
+        return {
+            p: content
+            for p, content in self.pending.items()
+            if content != self.originals[p]
+        }
+
+    def commit(self) -> list[Path]:
+        """
+        Write out the pending changes and return the paths of the files that
+        were actually modified
+        """
+        done: list[Path] = []
+        try:
+            for path, content in self.get_changes().items():
+                log.debug("Writing out changes to %s", path)
+                self._replace(path, content)
+                done.append(path)
+        except BaseException:
+            for path in reversed(done):
+                log.debug("Rolling back changes to %s", path)
+                try:
+                    self._replace(path, self.originals[path])
+                except OSError as e:
+                    log.error("Could not restore %s: %s", path, e)
+            raise
+        self.originals.update(self.pending)
+        self.pending.clear()
+        return done
+
+    @staticmethod
+    def _replace(path: Path, content: str | None) -> None:
+        if content is None:
+            path.unlink(missing_ok=True)
+        elif not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("w", encoding="utf-8") as fp:
+                fp.write(content)
+        else:
+            with NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=path.parent,
+                prefix=f".{path.name}.",
+                delete=False,
+            ) as tmp:
+                tmp.write(content)
+            try:
+                shutil.copymode(path, tmp.name)
+                os.replace(tmp.name, path)
+            except BaseException:
+                Path(tmp.name).unlink(missing_ok=True)
+                raise
@@ -1,19 +1,55 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from functools import cached_property
 import logging
 from pathlib import Path
 import subprocess
+import threading
 import time
-from typing import Any
+from typing import IO, Any
 from . import util
+from .cache import file_stamp, repo_cache_file
 
 log = logging.getLogger(__name__)
 
+#: Prefixes of refs that are stored separately for each worktree rather than in
+#: the common Git directory
+PER_WORKTREE_REFS = ("refs/bisect/", "refs/rewritten/", "refs/worktree/")
+
+#: Key under which the commit-year index is cached; change this whenever the
+#: format of the cached value changes
+COMMIT_YEARS_CACHE_KEY = "commit-years:1"
+
+#: Maximum number of ``git cat-file`` processes of each kind that a `Git`
+#: instance runs at once
+CAT_FILE_POOL_SIZE = 4
+
 
 @dataclass
 class Git:
     dirpath: Path
 
+    def __enter__(self) -> Git:
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down any ``git cat-file`` processes that have been started"""
+        for attr in ["batch", "batch_check"]:
+            if (cf := self.__dict__.pop(attr, None)) is not None:
+                cf.close()
+
+    @cached_property
+    def batch(self) -> CatFilePool:
+        return CatFilePool(dirpath=self.dirpath, mode="--batch")
+
+    @cached_property
+    def batch_check(self) -> CatFilePool:
+        return CatFilePool(dirpath=self.dirpath, mode="--batch-check")
+
     def run(self, *args: str | Path, **kwargs: Any) -> subprocess.CompletedProcess:
         return util.runcmd("git", *args, cwd=self.dirpath, **kwargs)
 
@@ -23,6 +59,17 @@ class Git:
     def readlines(self, *args: str | Path) -> list[str]:
         return self.read(*args).splitlines()
 
+    def iterlines(self, *args: str | Path) -> Iterator[str]:
+        return util.streamcmd("git", *args, cwd=self.dirpath)
+
+    def ls_files(self, *args: str | Path) -> list[str]:
+        """
+        Return the paths, relative to `dirpath`, output by ``git ls-files``
+        with the given arguments
+        """
+        r = self.run("ls-files", "-z", *args, stdout=subprocess.PIPE)
+        return [p for p in r.stdout.decode("utf-8").split("\0") if p]
+
     def get_remotes(self) -> list[str]:
         return self.readlines("remote")
 
@@ -33,26 +80,121 @@ class Git:
         self.run("remote", "add", remote, url)
 
     def get_commit_years(self, include_now: bool = True) -> list[int]:
-        years = set(map(int, self.readlines("log", "--format=%ad", "--date=format:%Y")))
+        years = self.get_history_years()
         if include_now:
             years.add(time.localtime().tm_year)
         return sorted(years)
 
+    def get_history_years(self) -> set[int]:
+        """
+        Return the set of years in which the commits reachable from HEAD were
+        authored.
+
+        The result is saved in the repository's cache directory along with the
+        commit it was computed for; as long as that commit is still an
+        ancestor of HEAD, later calls only need to examine the new commits.
+        """
+        gitdir = find_git_dir(self.dirpath)
+        if gitdir is None or (head := self.get_head()) is None:
+            return self.read_commit_years()
+        cache = repo_cache_file(gitdir, "commit-years.json")
+        cached = cache.load(COMMIT_YEARS_CACHE_KEY)
+        if cached is not None and cached["commit"] == head:
+            return set(cached["years"])
+        elif cached is not None and self.is_ancestor(cached["commit"], head):
+            years = set(cached["years"])
+            years.update(self.read_commit_years(f"{cached['commit']}..{head}"))
+        else:
+            years = self.read_commit_years(head)
+        cache.store(COMMIT_YEARS_CACHE_KEY, {"commit": head, "years": sorted(years)})
+        return years
+
+    def read_commit_years(self, *revs: str) -> set[int]:
+        return set(
+            map(int, self.iterlines("log", "--format=%ad", "--date=format:%Y", *revs))
+        )
+
+    def get_head(self) -> str | None:
+        """
+        Return the object ID of the commit that HEAD points to, or `None` if
+        there are no commits yet
+        """
+        if (refs := self.refs) is not None:
+            return refs.read_ref("HEAD")
+        return self.resolve("HEAD")
+
+    def resolve(self, rev: str) -> str | None:
+        """
+        Return the object ID that ``rev`` names, or `None` if there is no such
+        object
+        """
+        obj = self.batch_check.query(rev)
+        return obj.oid if obj is not None else None
+
+    def get_commit_message(self, rev: str) -> tuple[str, str]:
+        """
+        Return the subject and body of the message of the commit that ``rev``
+        names, like ``git show -s --format=%s%x00%b`` would
+        """
+        obj = self.batch.query(f"{rev}^{{commit}}")
+        if obj is None:
+            raise ValueError(f"No such commit: {rev!r}")
+        assert obj.content is not None
+        _, _, message = obj.content.decode("utf-8").partition("\n\n")
+        subject, _, body = message.strip("\n").partition("\n\n")
+        return (" ".join(subject.splitlines()), body)
+
+    def is_ancestor(self, rev1: str, rev2: str) -> bool:
+        r = self.run(
+            "merge-base",
+            "--is-ancestor",
+            rev1,
+            rev2,
+            check=False,
+            stderr=subprocess.DEVNULL,
+        )
+        return r.returncode == 0
+
+    @cached_property
+    def refs(self) -> RefReader | None:
+        """
+        A `RefReader` for the repository, or `None` if the repository's refs
+        cannot be read directly and the Git CLI must be used instead
+        """
+        return RefReader.for_worktree(self.dirpath)
+
     def get_default_branch(self) -> str:
         from .inspecting import InvalidProjectError
 
-        branches = set(self.readlines("branch", "--format=%(refname:short)"))
-        for guess in ["main", "master"]:
-            if guess in branches:
-                return guess
+        guesses = ["main", "master"]
+        if (refs := self.refs) is not None:
+            for guess in guesses:
+                if refs.has_ref(f"refs/heads/{guess}"):
+                    return guess
+        else:
+            branches = set(self.readlines("branch", "--format=%(refname:short)"))
+            for guess in guesses:
+                if guess in branches:
+                    return guess
         raise InvalidProjectError("Could not determine default Git branch")
 
     def get_latest_tag(self) -> str | None:
-        tags = self.readlines("tag", "-l", "--sort=-creatordate")
-        if tags:
-            return tags[0]
-        else:
+        """
+        Return the name of the most recently created tag (by tagger date for
+        annotated tags and committer date for lightweight tags), or `None` if
+        there are no tags
+        """
+        if (refs := self.refs) is not None and not refs.has_refs("refs/tags/"):
             return None
+        # Let Git pick out the newest tag instead of listing & sorting them all
+        tag = self.read(
+            "for-each-ref",
+            "--count=1",
+            "--sort=-creatordate",
+            "--format=%(refname:lstrip=2)",
+            "refs/tags",
+        )
+        return tag or None
 
     def get_config(self, key: str, default: str | None) -> str | None:
         if default is not None:
@@ -66,3 +208,285 @@ class Git:
                 return None
             else:
                 raise
+
+
+def find_git_dir(dirpath: Path) -> Path | None:
+    """
+    Return the Git directory of the repository whose working tree is rooted at
+    ``dirpath``, or `None` if there is no such directory
+    """
+    gitdir = dirpath / ".git"
+    if gitdir.is_dir():
+        return gitdir
+    # Linked worktrees and submodules have a `.git` file pointing to the real
+    # Git directory
+    try:
+        content = gitdir.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    if content.startswith("gitdir: "):
+        target = dirpath / content.removeprefix("gitdir: ").strip()
+        if target.is_dir():
+            return target.resolve()
+    return None
+
+
+@dataclass
+class GitObject:
+    oid: str
+    type: str
+    size: int
+    #: The object's content; only set when read via ``git cat-file --batch``
+    content: bytes | None = None
+
+
+@dataclass
+class CatFile:
+    """
+    A persistent ``git cat-file --batch`` or ``--batch-check`` process for
+    looking up objects without starting a new Git process for each query.
+    The process is started on first use and runs until `close()` is called.
+    """
+
+    dirpath: Path
+    #: Either ``"--batch"`` or ``"--batch-check"``
+    mode: str
+    proc: subprocess.Popen[bytes] | None = field(default=None, init=False, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def query(self, rev: str) -> GitObject | None:
+        """
+        Look up the object named by ``rev``, returning `None` if it does not
+        exist
+        """
+        if "\n" in rev:
+            raise ValueError(f"Revision contains newline: {rev!r}")
+        with self.lock:
+            stdin, stdout = self._pipes()
+            stdin.write(rev.encode("utf-8") + b"\n")
+            stdin.flush()
+            header = stdout.readline().decode("utf-8")
+            if not header:
+                self.close()
+                raise RuntimeError(f"git cat-file {self.mode} exited unexpectedly")
+            if header.endswith((" missing\n", " ambiguous\n")):
+                return None
+            oid, otype, size = header.split()
+            obj = GitObject(oid=oid, type=otype, size=int(size))
+            if self.mode == "--batch":
+                obj.content = stdout.read(obj.size)
+                # Discard the LF after the content
+                stdout.read(1)
+            return obj
+
+    def _pipes(self) -> tuple[IO[bytes], IO[bytes]]:
+        if self.proc is None:
+            log.debug("Starting: git cat-file %s", self.mode)
+            self.proc = subprocess.Popen(
+                ["git", "cat-file", self.mode],
+                cwd=self.dirpath,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        assert self.proc.stdin is not None
+        assert self.proc.stdout is not None
+        return (self.proc.stdin, self.proc.stdout)
+
+    def close(self) -> None:
+        if self.proc is not None:
+            assert self.proc.stdin is not None
+            self.proc.stdin.close()
+            self.proc.wait()
+            if self.proc.stdout is not None:
+                self.proc.stdout.close()
+            self.proc = None
+
+
+@dataclass
+class CatFilePool:
+    """
+    A pool of up to `size` `CatFile` processes of the same mode, so that
+    queries made from multiple threads at once (e.g., by concurrent release
+    steps) don't have to wait on a single process.  Processes are started
+    only as needed and are reused until `close()` is called.
+    """
+
+    dirpath: Path
+    #: Either ``"--batch"`` or ``"--batch-check"``
+    mode: str
+    size: int = CAT_FILE_POOL_SIZE
+    #: All processes started by the pool
+    readers: list[CatFile] = field(default_factory=list, init=False, repr=False)
+    #: Processes not currently in use by a query
+    idle: list[CatFile] = field(default_factory=list, init=False, repr=False)
+    cond: threading.Condition = field(
+        default_factory=threading.Condition, init=False, repr=False
+    )
+
+    def query(self, rev: str) -> GitObject | None:
+        """
+        Look up the object named by ``rev`` using an idle process, returning
+        `None` if it does not exist
+        """
+        with self.cond:
+            while not self.idle and len(self.readers) >= self.size:
+                self.cond.wait()
+            if self.idle:
+                reader = self.idle.pop()
+            else:
+                reader = CatFile(dirpath=self.dirpath, mode=self.mode)
+                self.readers.append(reader)
+        try:
+            return reader.query(rev)
+        finally:
+            with self.cond:
+                self.idle.append(reader)
+                self.cond.notify()
+
+    def close(self) -> None:
+        with self.cond:
+            for reader in self.readers:
+                reader.close()
+            self.readers.clear()
+            self.idle.clear()
+            self.cond.notify_all()
+
+
+def find_common_dir(gitdir: Path) -> Path:
+    """
+    Return the directory containing the refs & objects shared by all worktrees
+    of the repository with Git directory ``gitdir``
+    """
+    try:
+        commondir = (gitdir / "commondir").read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return gitdir
+    else:
+        return (gitdir / commondir).resolve()
+
+
+@dataclass
+class RefReader:
+    """
+    Reads a repository's refs directly from :file:`HEAD`, the loose ref files,
+    and :file:`packed-refs` without running Git.  Only the "files" ref backend
+    is supported.
+    """
+
+    #: The Git directory of the worktree, containing :file:`HEAD` and other
+    #: per-worktree refs
+    gitdir: Path
+    #: The Git directory shared by all worktrees, containing the branches &
+    #: tags
+    commondir: Path
+    #: The `file_stamp()` and contents of :file:`packed-refs` when last read
+    _packed: tuple[tuple[int, int, int] | None, dict[str, str]] | None = field(
+        default=None, init=False, repr=False
+    )
+
+    @classmethod
+    def for_worktree(cls, dirpath: Path) -> RefReader | None:
+        """
+        Return a `RefReader` for the repository whose working tree is rooted
+        at ``dirpath``, or `None` if there is no such repository or it uses a
+        ref storage layout that is not supported
+        """
+        if (gitdir := find_git_dir(dirpath)) is None:
+            return None
+        commondir = find_common_dir(gitdir)
+        if (commondir / "reftable").exists() or not (commondir / "refs").is_dir():
+            log.debug("Unsupported ref storage in %s; falling back to CLI", gitdir)
+            return None
+        return cls(gitdir=gitdir, commondir=commondir)
+
+    def ref_dir(self, refname: str) -> Path:
+        if refname.startswith(PER_WORKTREE_REFS) or not refname.startswith("refs/"):
+            return self.gitdir
+        else:
+            return self.commondir
+
+    @property
+    def packed_refs(self) -> dict[str, str]:
+        """
+        Mapping from ref names in :file:`packed-refs` to object IDs.  The file
+        is reread whenever it changes.
+        """
+        path = self.commondir / "packed-refs"
+        stamp = file_stamp(path)
+        if self._packed is not None and self._packed[0] == stamp:
+            return self._packed[1]
+        refs: dict[str, str] = {}
+        try:
+            with path.open(encoding="utf-8") as fp:
+                for line in fp:
+                    # Skip the header and the peeled objects of annotated tags
+                    if line.startswith(("#", "^")):
+                        continue
+                    oid, _, name = line.strip().partition(" ")
+                    if name:
+                        refs[name] = oid
+        except FileNotFoundError:
+            pass
+        self._packed = (stamp, refs)
+        return refs
+
+    def read_ref(self, refname: str) -> str | None:
+        """
+        Return the object ID that ``refname`` (e.g., ``"HEAD"`` or
+        ``"refs/heads/main"``) points to, following symbolic refs, or `None`
+        if the ref does not exist
+        """
+        seen = set()
+        while refname not in seen:
+            seen.add(refname)
+            try:
+                value = (self.ref_dir(refname) / refname).read_text(encoding="utf-8")
+            except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+                return self.packed_refs.get(refname)
+            value = value.strip()
+            if value.startswith("ref: "):
+                refname = value.removeprefix("ref: ")
+            else:
+                return value
+        return None
+
+    def read_symbolic_ref(self, refname: str = "HEAD") -> str | None:
+        """
+        Return the name of the ref that ``refname`` points to, or `None` if it
+        is not a symbolic ref (e.g., if HEAD is detached)
+        """
+        try:
+            value = (self.ref_dir(refname) / refname).read_text(encoding="utf-8")
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+        if value.startswith("ref: "):
+            return value.removeprefix("ref: ").strip()
+        else:
+            return None
+
+    def has_ref(self, refname: str) -> bool:
+        return (self.ref_dir(refname) / refname).is_file() or (
+            refname in self.packed_refs
+        )
+
+    def iter_refs(self, prefix: str = "refs/") -> Iterator[str]:
+        """
+        Yield the names of all refs under ``prefix``, which must end with a
+        slash
+        """
+        seen = set()
+        base = self.ref_dir(prefix)
+        topdir = base / prefix
+        if topdir.is_dir():
+            for p in topdir.rglob("*"):
+                if p.is_file() and not p.name.endswith(".lock"):
+                    name = p.relative_to(base).as_posix()
+                    seen.add(name)
+                    yield name
+        for name in self.packed_refs:
+            if name.startswith(prefix) and name not in seen:
+                yield name
+
+    def has_refs(self, prefix: str) -> bool:
+        """Test whether there are any refs under ``prefix``"""
+        return next(self.iter_refs(prefix), None) is not None
@@ -1,12 +1,21 @@
 from __future__ import annotations
 import ast
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from copy import deepcopy
 from dataclasses import asdict, dataclass
+import mmap
 from pathlib import Path
 import re
-from typing import Any
+from typing import TYPE_CHECKING, Any
+from packaging.requirements import Requirement
+from packaging.version import Version
 from ruamel.yaml import YAML
 from .util import yield_lines
 
+if TYPE_CHECKING:
+    from hatchling.metadata.core import ProjectMetadata
+
 
 class InvalidProjectError(Exception):
     pass
@@ -130,6 +139,148 @@ def parse_extra_testenvs(filepath: Path) -> dict[str, str]:
     return {inc["toxenv"]: inc["python-version"] for inc in includes}
 
 
+def get_project_metadata(
+    dirpath: Path, pyproj: dict[str, Any], fields: Iterable[str] | None = None
+) -> dict[str, Any]:
+    """
+    Return the project's description, authors, URLs, Python requirement,
+    dependencies, keywords, scripts, and version (or just the given ``fields``
+    thereof) in the same form as output by ``hatch project metadata``.
+
+    Static fields are read directly from the parsed ``pyproject.toml`` data
+    ``pyproj``; only fields listed in ``project.dynamic`` are resolved by
+    calling Hatchling (and thus any version source or metadata hook plugins)
+    in-process.
+    """
+    project = pyproj["project"]
+    dynamic = set(project.get("dynamic", []))
+    hatch_metadata: ProjectMetadata | None = None
+    metadata: dict[str, Any] = {}
+    for field in METADATA_FIELDS if fields is None else fields:
+        attr = METADATA_FIELDS[field]
+        if field in dynamic:
+            if hatch_metadata is None:
+                # Hatchling is slow to import, so only import it when needed
+                from hatchling.metadata import core
+                from hatchling.plugin.manager import PluginManager
+
+                # Hatchling modifies the config it's given, so give it a copy
+                hatch_metadata = core.ProjectMetadata(
+                    str(dirpath), PluginManager(), config=deepcopy(pyproj)
+                )
+            if field == "version":
+                metadata[field] = hatch_metadata.version
+            else:
+                metadata[field] = getattr(hatch_metadata.core, attr)
+        elif field in project:
+            value = project[field]
+            if field == "version":
+                value = str(Version(value))
+            elif field == "dependencies":
+                value = list(dict.fromkeys(map(normalize_dependency, value)))
+            elif field == "keywords":
+                value = sorted(set(value))
+            metadata[field] = value
+    return metadata
+
+
+#: Mapping from the metadata fields returned by `get_project_metadata()` to
+#: the names of the corresponding Hatchling `CoreMetadata` attributes
+METADATA_FIELDS = {
+    "version": "version",
+    "description": "description",
+    "authors": "authors",
+    "urls": "urls",
+    "requires-python": "requires_python",
+    "dependencies": "dependencies",
+    "keywords": "keywords",
+    "scripts": "scripts",
+}
+
+
+def normalize_dependency(req: str) -> str:
+    """Normalize a requirement string the same way that Hatchling does"""
+    from hatchling.metadata.utils import format_dependency, normalize_requirement
+
+    requirement = Requirement(req)
+    normalize_requirement(requirement)
+    return format_dependency(requirement)
+
+
+DOCTEST_RGX = re.compile(rb"^\s*>>>\s+", flags=re.M)
+
+
+def file_has_doctests(path: Path) -> bool:
+    """
+    Test whether the given Python source file contains any doctests.  The file
+    is memory-mapped rather than read in full, and searching stops at the
+    first match.
+    """
+    with path.open("rb") as fp:
+        try:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return False
+        with mm:
+            if (i := mm.find(b">>>")) == -1:
+                return False
+            # Resume the search from the start of the line containing the
+            # first ">>>"
+            return DOCTEST_RGX.search(mm, mm.rfind(b"\n", 0, i) + 1) is not None
+
+
+def scan_doctests(
+    paths: Sequence[Path],
+    cache: dict[str, Any] | None = None,
+    max_workers: int | None = None,
+) -> bool:
+    """
+    Test whether any of the given Python source files contain doctests,
+    scanning the files in parallel and stopping as soon as one is found.
+
+    If ``cache`` is given, it is used to look up & record the results for
+    individual files (keyed by path, modification time, and size) so that
+    unchanged files are not scanned again.
+    """
+    if cache is None:
+        cache = {}
+    for key in cache.keys() - set(map(str, paths)):
+        # Forget about files that no longer exist
+        del cache[key]
+    stats: dict[Path, list[int]] = {}
+    to_scan: list[Path] = []
+    for p in paths:
+        st = p.stat()
+        stats[p] = [st.st_mtime_ns, st.st_size]
+        match cache.get(str(p)):
+            case [mtime, size, bool(found)] if [mtime, size] == stats[p]:
+                if found:
+                    return True
+            case _:
+                to_scan.append(p)
+    if len(to_scan) <= 1:
+        for p in to_scan:
+            found = file_has_doctests(p)
+            cache[str(p)] = [*stats[p], found]
+            if found:
+                return True
+        return False
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(file_has_doctests, p): p for p in to_scan}
+        try:
+            for fut in as_completed(futures):
+                p = futures[fut]
+                found = fut.result()
+                cache[str(p)] = [*stats[p], found]
+                if found:
+                    return True
+        finally:
+            for fut in futures:
+                fut.cancel()
+    return False
+
+
 def find_project_root(dirpath: Path | None = None) -> Path | None:
     if dirpath is None:
         dirpath = Path()
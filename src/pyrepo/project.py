@@ -1,10 +1,12 @@
 from __future__ import annotations
 from bisect import insort
 from collections.abc import Callable, Iterator
-from contextlib import suppress
-from dataclasses import dataclass
+from contextlib import contextmanager, suppress
+from copy import deepcopy
+from dataclasses import dataclass, field
 from datetime import date
 from functools import cached_property, partial, wraps
+from io import StringIO
 import logging
 from pathlib import Path
 import re
@@ -13,36 +15,115 @@ import sys
 from typing import Any
 import click
 from configupdater import ConfigUpdater
-from in_place import InPlace
-from lineinfile import AfterLast, add_line_to_file
+from lineinfile import AfterLast, add_line_to_string
 from packaging.specifiers import SpecifierSet
+import tomlkit
 from . import git
+from .builds import BuildCache, get_build_env, get_build_key
+from .cache import file_stamp, repo_cache_file
 from .changelog import Changelog, ChangelogSection
 from .details import ProjectDetails
+from .edit import EditTransaction
 from .inspecting import InvalidProjectError, find_project_root
-from .tmpltr import TemplateWriter
-from .util import (
-    PyVersion,
-    map_lines,
-    maybe_map_lines,
-    next_version,
-    replace_group,
-    runcmd,
-)
+from .pyproject import PyProject, add_classifier, merge_toml, remove_classifier
+from .tmpltr import TemplateManifest, TemplateWriter
+from .util import LineRewriter, LineRule, PyVersion, next_version, runcmd
 
 log = logging.getLogger(__name__)
 
+# Preserve quotation marks around version:
+VERSION_RGX = re.compile(r'^__version__\s*=\s*([\x27"])(?P<version>.+)\1\s*$')
+
+ENVLIST_RGX = re.compile(r"^envlist\s*=[ \t]*(.+)$")
+
+REQUIRES_PYTHON_DOC_RGX = re.compile(r"requires Python (\d+(?:\.\d+)*)")
+
+PYTHON_CLASSIFIER_RGX = re.compile(r"Programming Language :: Python :: \d+\.\d+")
+
+
+@dataclass
+class CachedChangelog:
+    changelog: Changelog
+    #: The `file_stamp()` of the changelog file when it was parsed, or `None`
+    #: if the changelog was set by the current transaction and not yet written
+    stamp: tuple[int, int, int] | None
+
 
 @dataclass
 class Project:
     directory: Path
     details: ProjectDetails
+    #: The project's :file:`pyproject.toml`, shared between inspection and
+    #: editing
+    pyproject: PyProject = field(init=False, repr=False)
+    #: The edit transaction currently in progress, if any
+    tx: EditTransaction | None = field(default=None, init=False, repr=False)
+    #: Parsed changelogs, keyed by path
+    changelogs: dict[Path, CachedChangelog] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self.pyproject = PyProject(self.directory / "pyproject.toml")
 
     @classmethod
     def from_directory(cls, dirpath: Path | None = None) -> Project:
         if dirpath is None:
             dirpath = Path()
-        return cls(directory=dirpath, details=ProjectDetails.inspect(dirpath))
+        pyproject = PyProject(dirpath / "pyproject.toml")
+        project = cls(
+            directory=dirpath,
+            details=ProjectDetails.inspect(dirpath, pyproject=pyproject),
+        )
+        project.pyproject = pyproject
+        return project
+
+    def __enter__(self) -> Project:
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if "repo" in self.__dict__:
+            self.repo.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[EditTransaction]:
+        """
+        Context manager for reading & editing the project's files via an
+        `EditTransaction`.  The edits are written out when the outermost
+        transaction ends successfully and are discarded if an error occurs;
+        nested calls join the outermost transaction.  Edits made to the
+        `pyproject` document are serialized into the transaction at the end.
+        """
+        if self.tx is not None:
+            yield self.tx
+            return
+        self.tx = EditTransaction()
+        try:
+            yield self.tx
+            self.pyproject.save(self.tx)
+            edited = bool(self.tx.pending)
+            if modified := self.tx.commit():
+                for p in modified:
+                    log.info("Modified %s", p.relative_to(self.directory))
+            elif edited:
+                log.info("No files were modified")
+        except BaseException:
+            # Forget edits to pyproject.toml and changelogs that were never
+            # written
+            self.pyproject.discard()
+            for p, cached in list(self.changelogs.items()):
+                if cached.stamp is None:
+                    del self.changelogs[p]
+            raise
+        else:
+            for p, cached in self.changelogs.items():
+                if cached.stamp is None:
+                    cached.stamp = file_stamp(p)
+        finally:
+            self.tx = None
 
     @property
     def initfile(self) -> Path:
@@ -60,21 +141,47 @@ class Project:
         return any(c.startswith("Private") for c in self.details.classifiers)
 
     def get_template_writer(self) -> TemplateWriter:
-        return TemplateWriter(context=self.details.for_json(), basedir=self.directory)
+        if (gitdir := git.find_git_dir(self.directory)) is not None:
+            manifest = TemplateManifest(repo_cache_file(gitdir, "templates.json"))
+        else:
+            manifest = None
+        return TemplateWriter(
+            context=self.details.for_json(),
+            basedir=self.directory,
+            manifest=manifest,
+            tx=self.tx,
+        )
+
+    def get_managed_templates(self) -> list[str]:
+        """
+        Return the paths of the templated files that pyrepo keeps up to date
+        for the project.  Files like :file:`README.rst` that are only
+        templated on creation and then edited by hand are not included.
+        """
+        templates = [
+            ".gitignore",
+            ".pre-commit-config.yaml",
+            "pyproject.toml",
+            "tox.ini",
+        ]
+        if self.details.has_ci:
+            templates.extend([".github/renovate.json5", ".github/workflows/test.yml"])
+        if self.details.has_docs:
+            templates.extend(
+                [".readthedocs.yaml", "docs/conf.py", "docs/requirements.txt"]
+            )
+        return templates
 
     def set_version(self, version: str) -> None:
         if not self.details.uses_versioningit:
             log.info("Setting __version__ to %r ...", version)
-            map_lines(
-                self.initfile,
-                partial(
-                    replace_group,
-                    # Preserve quotation marks around version:
-                    r'^__version__\s*=\s*([\x27"])(?P<version>.+)\1\s*$',
-                    lambda _: version,
-                    group="version",
-                ),
-            )
+            with self.transaction() as tx:
+                tx.rewrite(
+                    self.initfile,
+                    LineRewriter(
+                        [LineRule.replace_group(VERSION_RGX, version, group="version")]
+                    ),
+                )
         self.details.version = version
 
     def get_changelog_paths(
@@ -87,82 +194,180 @@ class Project:
             paths = ["CHANGELOG.md", "CHANGELOG.rst"]
         for p in paths:
             fpath = self.directory / p
-            if not extant or fpath.exists():
+            if not extant or (
+                self.tx.exists(fpath) if self.tx is not None else fpath.exists()
+            ):
                 yield fpath
 
     def get_changelog(self, docs: bool = False) -> Changelog | None:
+        """
+        Load the project's changelog.  Only the first section is parsed; call
+        `Changelog.parse_all()` on the result to parse the rest.
+
+        Parsed changelogs are cached for the life of the `Project` and reparsed
+        only if the file changes on disk.  The returned object is a copy that
+        may be freely modified; pass it to `set_changelog()` to save changes.
+        """
+        # Read through the current transaction, if any, so that pending edits
+        # are seen, but don't start a transaction just to read
+        tx = self.tx
         for p in self.get_changelog_paths(docs):
-            with p.open(encoding="utf-8") as fp:
-                return Changelog.load(fp)
+            cached = self.changelogs.get(p)
+            pending = tx is not None and p in tx.pending
+            if pending:
+                current = cached is not None and cached.stamp is None
+            else:
+                current = cached is not None and cached.stamp == file_stamp(p)
+            if not current:
+                if tx is not None:
+                    stamp = None if pending else file_stamp(p)
+                    content = tx.read(p)
+                else:
+                    stamp = file_stamp(p)
+                    with p.open(encoding="utf-8") as fp:
+                        content = fp.read()
+                cached = CachedChangelog(
+                    changelog=Changelog.load(StringIO(content), lazy=True),
+                    stamp=stamp,
+                )
+                self.changelogs[p] = cached
+            assert cached is not None
+            return deepcopy(cached.changelog)
         return None
 
     def set_changelog(self, value: Changelog | None, docs: bool = False) -> None:
-        for p in self.get_changelog_paths(docs):
-            if value is None:
-                p.unlink()
-            else:
-                with p.open("w", encoding="utf-8") as fp:
-                    value.dump(fp)
-            return
-        if value is not None:
-            p = next(self.get_changelog_paths(docs, extant=False))
-            with p.open("w", encoding="utf-8") as fp:
-                value.dump(fp)
+        with self.transaction() as tx:
+            for p in self.get_changelog_paths(docs):
+                if value is None:
+                    tx.delete(p)
+                    self.changelogs.pop(p, None)
+                else:
+                    tx.write(p, str(value))
+                    self.changelogs[p] = CachedChangelog(deepcopy(value), None)
+                return
+            if value is not None:
+                p = next(self.get_changelog_paths(docs, extant=False))
+                tx.write(p, str(value))
+                self.changelogs[p] = CachedChangelog(deepcopy(value), None)
 
     def build(
-        self, sdist: bool = True, wheel: bool = True, clean: bool = False
+        self,
+        sdist: bool = True,
+        wheel: bool = True,
+        clean: bool = False,
+        cache: bool = True,
+        isolated: bool = False,
     ) -> None:
+        """
+        Build the project's artifacts into :file:`dist/`.
+
+        When ``clean`` is true, :file:`build/` and :file:`dist/` are deleted
+        first, and (if ``cache`` is also true and the project is in a Git
+        repository) the resulting artifacts are cached under a key derived from
+        the source tree and build configuration; if artifacts for the same key
+        have already been cached, they are copied into :file:`dist/` instead of
+        building anew.
+
+        Unless ``isolated`` is true, the build is run with ``--no-isolation``
+        inside a cached environment in which the project's static & dynamic
+        build requirements are already installed (see `get_build_env()`)
+        rather than in a fresh environment created by ``build``.
+        """
         if clean:
             with suppress(FileNotFoundError):
                 rmtree(self.directory / "build")
             with suppress(FileNotFoundError):
                 rmtree(self.directory / "dist")
-        if sdist or wheel:
-            args = []
-            if sdist:
-                args.append("--sdist")
-            if wheel:
-                args.append("--wheel")
-            runcmd(sys.executable, "-m", "build", *args, self.directory)
+        if not (sdist or wheel):
+            return
+        dist = self.directory / "dist"
+        build_cache: BuildCache | None = None
+        key = ""
+        if clean and cache and (gitdir := git.find_git_dir(self.directory)) is not None:
+            build_cache = BuildCache.for_gitdir(gitdir)
+            key = get_build_key(self, sdist=sdist, wheel=wheel)
+            if (artifacts := build_cache.fetch(key, dist)) is not None:
+                log.info(
+                    "Source tree unchanged since last build; reusing cached"
+                    " artifacts: %s",
+                    ", ".join(p.name for p in artifacts),
+                )
+                return
+        dists = []
+        if sdist:
+            dists.append("sdist")
+        if wheel:
+            dists.append("wheel")
+        args = [f"--{d}" for d in dists]
+        if isolated:
+            python = Path(sys.executable)
+        else:
+            requires = self.pyproject.data().get("build-system", {}).get("requires")
+            # pyproject.toml without a build-system.requires key defaults to
+            # setuptools, per PEP 518
+            python = get_build_env(
+                self.directory,
+                requires if requires is not None else ["setuptools>=40.8.0"],
+                dists,
+            )
+            args.append("--no-isolation")
+        runcmd(python, "-m", "build", *args, self.directory)
+        if build_cache is not None:
+            build_cache.store(key, sorted(dist.iterdir()))
 
     def unflatten(self) -> None:
         if not self.details.is_flat_module:
             log.info("Project is already a package; no need to unflatten")
             return
         log.info("Unflattening project ...")
-        pkgdir = self.directory / "src" / self.details.import_name
-        pkgdir.mkdir(parents=True, exist_ok=True)
-        old_initfile = self.initfile
-        new_initfile = pkgdir / "__init__.py"
-        log.info(
-            "Moving %s to %s ...",
-            old_initfile.relative_to(self.directory),
-            new_initfile.relative_to(self.directory),
-        )
-        old_initfile.rename(new_initfile)
-        import_name = self.details.import_name
-        log.info("Updating pyproject.toml ...")
-        with InPlace(self.directory / "pyproject.toml", encoding="utf-8") as fp:
-            for line in fp:
-                if re.match(r"path\s*=", line):
-                    line = f'path = "src/{import_name}/__init__.py"\n'
-                elif line.rstrip() == f'    "/{import_name}.py",':
-                    line = '    "/src",\n'
-                fp.write(line)  # noqa: B038
-        if (self.directory / "tox.ini").exists():
-            log.info("Updating tox.ini ...")
-            with InPlace(self.directory / "tox.ini", encoding="utf-8") as fp:
-                for line in fp:
-                    line = re.sub(
-                        rf"^(\s+(?:flake8|mypy)\s+){import_name}.py\b", r"\1src", line
-                    )
-                    if line.rstrip() == f"    {import_name}.py":
-                        line = "    src\n"
-                    elif line.rstrip() == f"    .tox/**/site-packages/{import_name}.py":
-                        line = line.replace(f"/{import_name}.py", "")
-                    print(line, end="", file=fp)
-                    if re.match(r"sort_relative_in_force_sorted_sections\s*=", line):
-                        print("src_paths = src", file=fp)
+        # These details are determined from the module's files on disk, which
+        # won't be moved until the transaction is committed, so compute them
+        # while they still match `is_flat_module`:
+        for name in ("version", "has_doctests"):
+            getattr(self.details, name)
+        with self.transaction() as tx:
+            pkgdir = self.directory / "src" / self.details.import_name
+            old_initfile = self.initfile
+            new_initfile = pkgdir / "__init__.py"
+            log.info(
+                "Moving %s to %s ...",
+                old_initfile.relative_to(self.directory),
+                new_initfile.relative_to(self.directory),
+            )
+            tx.move(old_initfile, new_initfile)
+            log.info("Updating pyproject.toml ...")
+            hatch = self.pyproject.load(tx).get("tool", {}).get("hatch", {})
+            if "path" in (version_cfg := hatch.get("version", {})):
+                version_cfg["path"] = f"src/{self.details.import_name}/__init__.py"
+            sdist = hatch.get("build", {}).get("targets", {}).get("sdist", {})
+            include = sdist.get("include", [])
+            for i, path in enumerate(include):
+                if path == f"/{self.details.import_name}.py":
+                    include[i] = "/src"
+            modfile = re.escape(f"{self.details.import_name}.py")
+            toxpath = self.directory / "tox.ini"
+            if tx.exists(toxpath):
+                log.info("Updating tox.ini ...")
+                tx.rewrite(
+                    toxpath,
+                    LineRewriter(
+                        [
+                            LineRule.replace_group(
+                                rf"^\s+(?:flake8|mypy)\s+({modfile})\b", "src"
+                            ),
+                            LineRule.replace_line(rf"    {modfile}\s*", "    src\n"),
+                            LineRule.replace_group(
+                                rf"^    \.tox/\*\*/site-packages(/{modfile})\s*$", ""
+                            ),
+                            LineRule(
+                                re.compile(
+                                    r"^sort_relative_in_force_sorted_sections\s*="
+                                ),
+                                lambda _m, line: line + "src_paths = src\n",
+                            ),
+                        ]
+                    ),
+                )
         self.details.is_flat_module = False
 
     def add_typing(self) -> None:
@@ -170,58 +375,60 @@ class Project:
             log.info("Project already has typing; no need to add it")
             return
         log.info("Adding typing configuration ...")
-        self.unflatten()
-        log.info("Creating src/%s/py.typed ...", self.details.import_name)
-        (self.directory / "src" / self.details.import_name / "py.typed").touch()
-        templater = self.details.get_templater()
-        log.info("Updating pyproject.toml ...")
-        with InPlace(self.directory / "pyproject.toml", encoding="utf-8") as fp:
-            in_classifiers = False
-            for line in fp:
-                if line == "classifiers = [\n":
-                    in_classifiers = True
-                elif in_classifiers and line == "]\n":
-                    print('    "Typing :: Typed",', file=fp)
-                    in_classifiers = False
-                fp.write(line)  # noqa: B038
-            mypy_cfg = templater.get_template_block("pyproject.toml.j2", "mypy")
-            print(mypy_cfg, end="", file=fp)
-        if self.details.has_tests:
-            log.info("Updating tox.ini ...")
-            toxfile = ConfigUpdater()
-            toxfile.read(str(self.directory / "tox.ini"), encoding="utf-8")
-            try:
-                envlist = toxfile["tox"]["envlist"].value
-            except KeyError:
-                raise RuntimeError("Could not find [tox]envlist in tox.ini")
-            else:
-                assert envlist is not None
-                toxfile["tox"]["envlist"].value = add_typing_env(envlist)
-            testenv_typing = ConfigUpdater()
-            testenv_typing.read_string(
-                templater.get_template_block(
-                    "tox.ini.j2",
-                    "testenv_typing",
-                    variables={"has_tests": self.details.has_tests},
-                )
+        with self.transaction() as tx:
+            self.unflatten()
+            log.info("Creating src/%s/py.typed ...", self.details.import_name)
+            pytyped = self.directory / "src" / self.details.import_name / "py.typed"
+            if not tx.exists(pytyped):
+                tx.write(pytyped, "")
+            templater = self.details.get_templater()
+            log.info("Updating pyproject.toml ...")
+            doc = self.pyproject.load(tx)
+            add_classifier(doc, "Typing :: Typed")
+            merge_toml(
+                doc,
+                tomlkit.parse(
+                    templater.get_template_block("pyproject.toml.j2", "mypy")
+                ),
             )
-            toxfile["pytest"].add_before.section(
-                testenv_typing["testenv:typing"].detach()
-            ).space()
-            toxfile.update_file()
-        if self.details.has_ci:
-            self.add_ci_testenv("typing", str(self.details.python_versions[0]))
+            if self.details.has_tests:
+                log.info("Updating tox.ini ...")
+                toxpath = self.directory / "tox.ini"
+                toxfile = ConfigUpdater()
+                toxfile.read_string(tx.read(toxpath))
+                try:
+                    envlist = toxfile["tox"]["envlist"].value
+                except KeyError:
+                    raise RuntimeError("Could not find [tox]envlist in tox.ini")
+                else:
+                    assert envlist is not None
+                    toxfile["tox"]["envlist"].value = add_typing_env(envlist)
+                testenv_typing = ConfigUpdater()
+                testenv_typing.read_string(
+                    templater.get_template_block(
+                        "tox.ini.j2",
+                        "testenv_typing",
+                        variables={"has_tests": self.details.has_tests},
+                    )
+                )
+                toxfile["pytest"].add_before.section(
+                    testenv_typing["testenv:typing"].detach()
+                ).space()
+                tx.write(toxpath, str(toxfile))
+            if self.details.has_ci:
+                self.add_ci_testenv("typing", str(self.details.python_versions[0]))
         self.details.has_typing = True
 
     def add_ci_testenv(self, testenv: str, pyver: str) -> None:
         log.info("Adding testenv %r with Python version %r", testenv, pyver)
         self.details.extra_testenvs[testenv] = pyver
-        twriter = self.get_template_writer()
-        twriter.write(".github/workflows/test.yml")
-        if not (self.directory / ".github" / "renovate.json5").exists():
-            log.info("Creating Renovate configuration")
-            twriter.write(".github/renovate.json5")
-            log.warning("Please set up custom Renovate labels separately")
+        with self.transaction() as tx:
+            twriter = self.get_template_writer()
+            twriter.write(".github/workflows/test.yml")
+            if not tx.exists(self.directory / ".github" / "renovate.json5"):
+                log.info("Creating Renovate configuration")
+                twriter.write(".github/renovate.json5")
+                log.warning("Please set up custom Renovate labels separately")
 
     def add_pyversion(self, v: str) -> None:
         pyv = PyVersion.parse(v)
@@ -234,35 +441,36 @@ class Project:
                 f" {self.details.python_requires!r}"
             )
         log.info("Adding %s to supported Python versions", pyv)
-        self.begin_dev(quiet=True)
-        log.info("Updating pyproject.toml ...")
-        add_line_to_file(
-            self.directory / "pyproject.toml",
-            f'    "Programming Language :: Python :: {pyv}",\n',
-            inserter=AfterLast(r'^    "Programming Language :: Python :: \d+\.\d+",$'),
-            encoding="utf-8",
-        )
-        if self.details.has_tests:
-            log.info("Updating tox.ini ...")
-            map_lines(
-                self.directory / "tox.ini",
-                partial(
-                    replace_group,
-                    re.compile(r"^envlist\s*=[ \t]*(.+)$"),
-                    partial(add_py_env, pyv),
-                ),
+        with self.transaction() as tx:
+            self.begin_dev(quiet=True)
+            log.info("Updating pyproject.toml ...")
+            add_classifier(
+                self.pyproject.load(tx),
+                f"Programming Language :: Python :: {pyv}",
+                after=PYTHON_CLASSIFIER_RGX,
             )
-        if self.details.has_ci:
-            log.info("Updating .github/workflows/test.yml ...")
-            add_line_to_file(
-                self.directory / ".github" / "workflows" / "test.yml",
-                f"{' ' * 10}- '{pyv}'\n",  # noqa: B028
-                inserter=AfterLast(rf"^{' ' * 10}- ['\x22]?\d+\.\d+['\x22]?$"),
-                encoding="utf-8",
+            if self.details.has_tests:
+                log.info("Updating tox.ini ...")
+                tx.rewrite(
+                    self.directory / "tox.ini",
+                    LineRewriter(
+                        [LineRule.replace_group(ENVLIST_RGX, partial(add_py_env, pyv))]
+                    ),
+                )
+            if self.details.has_ci:
+                log.info("Updating .github/workflows/test.yml ...")
+                test_yml = self.directory / ".github" / "workflows" / "test.yml"
+                tx.write(
+                    test_yml,
+                    add_line_to_string(
+                        tx.read(test_yml),
+                        f"{' ' * 10}- '{pyv}'\n",  # noqa: B028
+                        inserter=AfterLast(rf"^{' ' * 10}- ['\x22]?\d+\.\d+['\x22]?$"),
+                    ),
+                )
+            self.update_latest_changelog_section(
+                lambda items: add_pyversion_chlog(pyv, items)
             )
-        self.update_latest_changelog_section(
-            lambda items: add_pyversion_chlog(pyv, items)
-        )
         insort(self.details.python_versions, pyv)
 
     def drop_pyversion(self) -> None:
@@ -275,162 +483,149 @@ class Project:
             raise ValueError("Only one supported Python version; not dropping")
         dropver = self.details.python_versions.pop(0)
         log.info("Dropping %s from supported Python versions", dropver)
-        self.begin_dev(quiet=True)
-        newmin = self.details.python_versions[0]
-        self.details.python_requires = re.sub(
-            r"\d+(?:\.\d+)*", str(newmin), self.details.python_requires
-        )
-        log.info("Updating README.rst ...")
-        map_lines(
-            self.directory / "README.rst",
-            partial(
-                replace_group,
-                re.compile(r"requires Python (\d+(?:\.\d+)*)"),
-                str(newmin),
-            ),
-        )
-        if (self.directory / "docs").exists():
-            log.info("Updating docs/index.rst ...")
-            map_lines(
-                self.directory / "docs" / "index.rst",
-                partial(
-                    replace_group,
-                    re.compile(r"requires Python (\d+(?:\.\d+)*)"),
-                    str(newmin),
-                ),
+        with self.transaction() as tx:
+            self.begin_dev(quiet=True)
+            newmin = self.details.python_versions[0]
+            self.details.python_requires = re.sub(
+                r"\d+(?:\.\d+)*", str(newmin), self.details.python_requires
             )
-        self.update_latest_changelog_section(
-            lambda items: drop_pyversion_chlog(dropver, items)
-        )
-
-        def edit_pyproject_line(line: str) -> str | None:
-            if line == f'    "Programming Language :: Python :: {dropver}",\n':
-                return None
-            else:
-                return replace_group(
-                    re.compile(r'^requires-python\s*=\s*"(.+)"$'),
-                    self.details.python_requires,
-                    line,
-                )
-
-        log.info("Updating pyproject.toml ...")
-        maybe_map_lines(self.directory / "pyproject.toml", edit_pyproject_line)
-        if self.details.has_tests:
-            log.info("Updating tox.ini ...")
-            map_lines(
-                self.directory / "tox.ini",
-                partial(
-                    replace_group,
-                    re.compile(r"^envlist\s*=[ \t]*(.+)$"),
-                    partial(rm_py_env, dropver),
+            log.info("Updating README.rst ...")
+            tx.rewrite(
+                self.directory / "README.rst",
+                LineRewriter(
+                    [LineRule.replace_group(REQUIRES_PYTHON_DOC_RGX, str(newmin))]
                 ),
             )
-        if self.details.has_ci:
-
-            def edit_test_yml_line(line: str) -> str | None:
-                if re.fullmatch(
-                    rf"{' ' * 10}- ['\x22]?(?:pypy-)?{re.escape(str(dropver))}"
-                    rf"['\x22]?\s*",
-                    line,
-                ):
-                    return None
-                else:
-                    return replace_group(
-                        re.compile(
-                            rf"^{' ' * 10}- python-version: (['\x22]?"
-                            rf"{re.escape(str(dropver))}['\x22]?)\s*$"
-                        ),
-                        f"'{newmin}'",  # noqa: B028
-                        line,
-                    )
-
-            log.info("Updating .github/workflows/test.yml ...")
-            maybe_map_lines(
-                self.directory / ".github" / "workflows" / "test.yml",
-                edit_test_yml_line,
+            if (self.directory / "docs").exists():
+                log.info("Updating docs/index.rst ...")
+                tx.rewrite(
+                    self.directory / "docs" / "index.rst",
+                    LineRewriter(
+                        [LineRule.replace_group(REQUIRES_PYTHON_DOC_RGX, str(newmin))]
+                    ),
+                )
+            self.update_latest_changelog_section(
+                lambda items: drop_pyversion_chlog(dropver, items)
             )
+            log.info("Updating pyproject.toml ...")
+            doc = self.pyproject.load(tx)
+            remove_classifier(doc, f"Programming Language :: Python :: {dropver}")
+            doc["project"]["requires-python"] = self.details.python_requires
+            if self.details.has_tests:
+                log.info("Updating tox.ini ...")
+                tx.rewrite(
+                    self.directory / "tox.ini",
+                    LineRewriter(
+                        [
+                            LineRule.replace_group(
+                                ENVLIST_RGX, partial(rm_py_env, dropver)
+                            )
+                        ]
+                    ),
+                )
+            if self.details.has_ci:
+                log.info("Updating .github/workflows/test.yml ...")
+                tx.rewrite(
+                    self.directory / ".github" / "workflows" / "test.yml",
+                    LineRewriter(
+                        [
+                            LineRule.delete_line(
+                                rf"{' ' * 10}- ['\x22]?(?:pypy-)?"
+                                rf"{re.escape(str(dropver))}"
+                                rf"['\x22]?\s*"
+                            ),
+                            LineRule.replace_group(
+                                rf"^{' ' * 10}- python-version: (['\x22]?"
+                                rf"{re.escape(str(dropver))}['\x22]?)\s*$",
+                                f"'{newmin}'",  # noqa: B028
+                            ),
+                        ]
+                    ),
+                )
 
     def begin_dev(self, use_next_version: bool = True, quiet: bool = False) -> None:
-        chlog = self.get_changelog()
-        if (
-            chlog is not None
-            and chlog.sections
-            and chlog.sections[0].release_date is None
-        ):
-            if not quiet:
-                log.info("Project is already in dev state; not adjusting")
-            return
-        log.info("Preparing for work on next version ...")
-        # Set __version__ to the next version number plus ".dev1"
-        old_version = self.details.version
-        if use_next_version:
-            new_version = next_version(old_version)
-            self.set_version(f"{new_version}.dev1")
-        else:
-            new_version = next_version(old_version, post=True)
-            self.set_version(new_version)
-        # Add new section to top of CHANGELOGs
-        new_sect = ChangelogSection(
-            version=f"v{new_version}" if use_next_version else None,
-            release_date=None,
-            content="",
-        )
-        for docs in (False, True):
-            if docs:
-                if not (self.directory / "docs").exists():
-                    continue
-                log.info("Adding new section to docs/changelog.rst ...")
+        with self.transaction():
+            chlog = self.get_changelog()
+            if (
+                chlog is not None
+                and chlog.sections
+                and chlog.sections[0].release_date is None
+            ):
+                if not quiet:
+                    log.info("Project is already in dev state; not adjusting")
+                return
+            log.info("Preparing for work on next version ...")
+            # Set __version__ to the next version number plus ".dev1"
+            old_version = self.details.version
+            if use_next_version:
+                new_version = next_version(old_version)
+                self.set_version(f"{new_version}.dev1")
             else:
-                log.info("Adding new section to CHANGELOG ...")
-            chlog = self.get_changelog(docs=docs)
-            if chlog is not None and chlog.sections:
-                chlog.sections.insert(0, new_sect)
-            else:
-                chlog = Changelog(
-                    intro=(
-                        (
-                            f".. currentmodule:: {self.details.import_name}\n"
-                            "\n"
-                            "Changelog\n"
-                            "=========\n"
-                            "\n"
-                        )
-                        if docs
-                        else ""
-                    ),
-                    sections=[
-                        new_sect,
-                        ChangelogSection(
-                            version=f"v{old_version}",
-                            release_date=date.today(),
-                            content="Initial release",
+                new_version = next_version(old_version, post=True)
+                self.set_version(new_version)
+            # Add new section to top of CHANGELOGs
+            new_sect = ChangelogSection(
+                version=f"v{new_version}" if use_next_version else None,
+                release_date=None,
+                content="",
+            )
+            for docs in (False, True):
+                if docs:
+                    if not (self.directory / "docs").exists():
+                        continue
+                    log.info("Adding new section to docs/changelog.rst ...")
+                else:
+                    log.info("Adding new section to CHANGELOG ...")
+                chlog = self.get_changelog(docs=docs)
+                if chlog is not None and chlog.sections:
+                    chlog.sections.insert(0, new_sect)
+                else:
+                    chlog = Changelog(
+                        intro=(
+                            (
+                                f".. currentmodule:: {self.details.import_name}\n"
+                                "\n"
+                                "Changelog\n"
+                                "=========\n"
+                                "\n"
+                            )
+                            if docs
+                            else ""
                         ),
-                    ],
-                )
-            self.set_changelog(chlog, docs=docs)
+                        sections=[
+                            new_sect,
+                            ChangelogSection(
+                                version=f"v{old_version}",
+                                release_date=date.today(),
+                                content="Initial release",
+                            ),
+                        ],
+                    )
+                self.set_changelog(chlog, docs=docs)
 
     def update_latest_changelog_section(
         self, func: Callable[[list[str]], list[str]]
     ) -> None:
-        for docs in (False, True):
-            if docs:
-                if not (self.directory / "docs").exists():
-                    continue
-                log.info("Updating docs/changelog.rst ...")
-            else:
-                log.info("Updating CHANGELOG ...")
-            chlog = self.get_changelog(docs=docs)
-            if chlog is not None and chlog.sections:
-                items = chlog.sections[0].get_items()
-                new_items = func(items)
-                if new_items != items:
-                    log.info("No change to content")
+        with self.transaction():
+            for docs in (False, True):
+                if docs:
+                    if not (self.directory / "docs").exists():
+                        continue
+                    log.info("Updating docs/changelog.rst ...")
                 else:
-                    chlog.sections[0].set_items(new_items)
-                    self.set_changelog(chlog, docs=docs)
-            else:
-                ### TODO: Error?
-                log.warning("Changlog is absent/empty; not updating")
+                    log.info("Updating CHANGELOG ...")
+                chlog = self.get_changelog(docs=docs)
+                if chlog is not None and chlog.sections:
+                    items = chlog.sections[0].get_items()
+                    new_items = func(list(items))
+                    if new_items == items:
+                        log.info("No change to content")
+                    else:
+                        chlog.sections[0].set_items(new_items)
+                        self.set_changelog(chlog, docs=docs)
+                else:
+                    ### TODO: Error?
+                    log.warning("Changlog is absent/empty; not updating")
 
 
 def add_typing_env(envlist: str) -> str:
@@ -467,7 +662,8 @@ def with_project(func: Callable) -> Callable:
             project = Project.from_directory(dirpath)
         except InvalidProjectError as e:
             raise click.UsageError(str(e))
-        return func(*args, project=project, **kwargs)
+        with project:
+            return func(*args, project=project, **kwargs)
 
     return wrapped
 
@@ -0,0 +1,126 @@
+from __future__ import annotations
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass, field
+import logging
+from pathlib import Path
+import re
+from typing import Any
+import tomlkit
+from tomlkit.items import Array, Table
+from .edit import EditTransaction
+from .inspecting import InvalidProjectError
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PyProject:
+    """
+    A project's :file:`pyproject.toml`, parsed at most once into a round-trip
+    `tomlkit` document that preserves comments & formatting.  The same
+    document is used both for inspecting the project and for editing the file;
+    edits are made to the document in place and written out by `save()`.
+    """
+
+    path: Path
+    _doc: tomlkit.TOMLDocument | None = field(default=None, init=False, repr=False)
+    #: The text that ``_doc`` was parsed from or last saved as
+    _text: str | None = field(default=None, init=False, repr=False)
+    #: The contents of ``_text`` as plain Python values
+    _data: dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+
+    def load(self, tx: EditTransaction | None = None) -> tomlkit.TOMLDocument:
+        """
+        Return the parsed document.  If ``tx`` is given, the document reflects
+        the file's contents in the transaction, and it is only reparsed if
+        those contents have been changed by something other than the document.
+        """
+        try:
+            if tx is not None:
+                text = tx.read(self.path)
+            elif self._doc is not None:
+                return self._doc
+            else:
+                with self.path.open(encoding="utf-8") as fp:
+                    text = fp.read()
+        except FileNotFoundError:
+            raise InvalidProjectError("Project is missing pyproject.toml file")
+        if self._doc is None or text != self._text:
+            log.debug("Parsing %s", self.path)
+            self._doc = tomlkit.parse(text)
+            self._text = text
+            self._data = self._doc.unwrap()
+        return self._doc
+
+    def data(self) -> dict[str, Any]:
+        """
+        Return the contents of the file as plain Python values.  Edits made to
+        the document are not reflected until they are saved.
+        """
+        self.load()
+        return self._data
+
+    def discard(self) -> None:
+        """
+        Forget the parsed document along with any unsaved edits to it, e.g.,
+        when the transaction they were made in is rolled back
+        """
+        self._doc = None
+        self._text = None
+        self._data = {}
+
+    def save(self, tx: EditTransaction) -> None:
+        """Write any edits made to the document to ``tx``"""
+        if self._doc is not None:
+            text = self._doc.as_string()
+            if text != self._text:
+                tx.write(self.path, text)
+                self._text = text
+                self._data = self._doc.unwrap()
+
+
+def get_classifiers(doc: tomlkit.TOMLDocument) -> Array:
+    project = doc["project"]
+    assert isinstance(project, Table)
+    if "classifiers" not in project:
+        project["classifiers"] = tomlkit.array().multiline(True)
+    classifiers = project["classifiers"]
+    assert isinstance(classifiers, Array)
+    return classifiers
+
+
+def add_classifier(
+    doc: tomlkit.TOMLDocument, classifier: str, after: re.Pattern[str] | None = None
+) -> None:
+    """
+    Add ``classifier`` to the project's classifiers after the last classifier
+    matching ``after``; if ``after`` is `None` or does not match any
+    classifiers, ``classifier`` is added to the end of the list
+    """
+    classifiers = get_classifiers(doc)
+    index = len(classifiers)
+    if after is not None:
+        for i, c in enumerate(classifiers):
+            if after.fullmatch(str(c)):
+                index = i + 1
+    classifiers.insert(index, classifier)
+
+
+def remove_classifier(doc: tomlkit.TOMLDocument, classifier: str) -> None:
+    classifiers = get_classifiers(doc)
+    for i, c in enumerate(classifiers):
+        if str(c) == classifier:
+            del classifiers[i]
+            break
+
+
+def merge_toml(dest: MutableMapping[str, Any], src: Mapping[str, Any]) -> None:
+    """
+    Add the tables & keys in ``src`` to ``dest``, recursing into tables that
+    exist in both
+    """
+    for key, value in src.items():
+        if isinstance(value, Table) and isinstance(dest.get(key), MutableMapping):
+            merge_toml(dest[key], value)
+        else:
+            dest[key] = value
@@ -0,0 +1,83 @@
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import logging
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Step:
+    """A unit of work that can only be run after certain other steps"""
+
+    name: str
+    func: Callable[[], Any]
+    #: Names of the steps that must complete before this one can run
+    deps: list[str] = field(default_factory=list)
+
+
+def check_steps(steps: list[Step]) -> None:
+    """
+    Check that the dependencies of each step in ``steps`` come before it in
+    the list, which also rules out cycles
+    """
+    seen: set[str] = set()
+    for s in steps:
+        if s.name in seen:
+            raise ValueError(f"Duplicate step {s.name!r}")
+        for d in s.deps:
+            if d not in seen:
+                raise ValueError(
+                    f"Step {s.name!r} depends on {d!r}, which does not precede it"
+                )
+        seen.add(s.name)
+
+
+def run_steps(steps: list[Step], serial: bool = False) -> None:
+    """
+    Run ``steps``, each one after all of the steps it depends on have
+    completed.  ``steps`` must be in an order in which they can be run one at
+    a time.
+
+    If ``serial`` is true, the steps are run one at a time in the order given,
+    stopping at the first failure.  Otherwise, every step whose dependencies
+    have completed is run at once in a thread pool; if a step fails, the steps
+    that depend on it are not run, but the other steps still run to
+    completion, after which the first error is raised.
+    """
+    check_steps(steps)
+    if serial:
+        for s in steps:
+            s.func()
+        return
+    pending = {s.name: s for s in steps}
+    done: set[str] = set()
+    errors: list[BaseException] = []
+    with ThreadPoolExecutor(max_workers=len(steps) or 1) as pool:
+        running: dict[Future[Any], Step] = {}
+
+        def submit_ready() -> None:
+            for s in list(pending.values()):
+                if all(d in done for d in s.deps):
+                    log.debug("Starting step %r", s.name)
+                    del pending[s.name]
+                    running[pool.submit(s.func)] = s
+
+        submit_ready()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                s = running.pop(fut)
+                if (e := fut.exception()) is None:
+                    log.debug("Step %r completed", s.name)
+                    done.add(s.name)
+                else:
+                    log.error("Step %r failed: %s", s.name, e)
+                    errors.append(e)
+            submit_ready()
+    if errors:
+        for name in pending:
+            log.error("Step %r not run due to earlier failure", name)
+        raise errors[0]
@@ -1,13 +1,114 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+from difflib import unified_diff
+from functools import cache
+from hashlib import sha256
+import json
 import logging
 from pathlib import Path
 from typing import Any
-from jinja2 import Environment
-from .util import get_jinja_env
+from jinja2 import ChoiceLoader, Environment, TemplateNotFound, meta, nodes
+from .cache import CacheFile, Fingerprint
+from .edit import EditTransaction
+from .util import FILTER_STATE, get_jinja_env
 
 log = logging.getLogger(__name__)
 
+#: Key under which `TemplateManifest` data is cached; change this whenever the
+#: format of the manifest changes
+MANIFEST_KEY = "templates:1"
+
+
+@dataclass
+class TemplateDeps:
+    """The inputs that rendering a template depends on"""
+
+    #: The sources of the template and of all templates it includes, imports,
+    #: or extends
+    sources: list[str] = field(default_factory=list)
+    #: Names of context variables that the templates use
+    variables: set[str] = field(default_factory=set)
+    #: Names of filters that the templates use
+    filters: set[str] = field(default_factory=set)
+
+
+@cache
+def get_template_deps(jenv: Environment, name: str) -> TemplateDeps | None:
+    """
+    Statically determine the inputs of the template ``name``.  Returns `None`
+    if they cannot be determined (e.g., because the template includes a
+    template whose name is computed at runtime).
+    """
+    deps = TemplateDeps()
+    todo = [name]
+    seen = set()
+    while todo:
+        tname = todo.pop()
+        if tname in seen:
+            continue
+        seen.add(tname)
+        source = get_template_source(jenv, tname)
+        ast = jenv.parse(source)
+        deps.sources.append(source)
+        deps.variables |= meta.find_undeclared_variables(ast)
+        deps.filters |= {n.name for n in ast.find_all(nodes.Filter)}
+        for ref in meta.find_referenced_templates(ast):
+            if ref is None:
+                return None
+            todo.append(ref)
+    return deps
+
+
+def get_template_source(jenv: Environment, name: str) -> str:
+    # The loader for precompiled templates cannot provide source code, so look
+    # for a loader that can.
+    loader = jenv.loader
+    loaders = loader.loaders if isinstance(loader, ChoiceLoader) else [loader]
+    for ld in loaders:
+        if ld is not None and ld.has_source_access:
+            try:
+                source, _, _ = ld.get_source(jenv, name)
+            except TemplateNotFound:
+                continue
+            return source
+    raise TemplateNotFound(name)
+
+
+@dataclass
+class TemplateManifest:
+    """
+    A record, stored in a cache file, of the inputs that each template was last
+    rendered from and the resulting output, used to skip re-rendering
+    templates whose inputs have not changed
+    """
+
+    cachefile: CacheFile
+    entries: dict[str, dict[str, str]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        data = self.cachefile.load(MANIFEST_KEY)
+        self.entries = data if isinstance(data, dict) else {}
+
+    def is_current(self, template_path: str, inputs: str, content: str) -> bool:
+        """
+        Test whether ``template_path`` was last rendered from ``inputs`` and
+        the output is still the same as ``content``
+        """
+        return self.entries.get(template_path) == {
+            "inputs": inputs,
+            "output": digest(content),
+        }
+
+    def record(self, template_path: str, inputs: str, content: str) -> None:
+        entry = {"inputs": inputs, "output": digest(content)}
+        if self.entries.get(template_path) != entry:
+            self.entries[template_path] = entry
+            self.cachefile.store(MANIFEST_KEY, self.entries)
+
+
+def digest(s: str) -> str:
+    return sha256(s.encode("utf-8")).hexdigest()
+
 
 @dataclass
 class Templater:
@@ -36,12 +137,107 @@ class Templater:
 @dataclass
 class TemplateWriter(Templater):
     basedir: Path
+    #: If set, templates whose inputs & output files are unchanged since they
+    #: were last written are not re-rendered
+    manifest: TemplateManifest | None = None
+    #: If set, files are read & written through this transaction
+    tx: EditTransaction | None = None
+
+    def read_current(self, template_path: str) -> str | None:
+        """
+        Return the current contents of the file that ``template_path`` renders
+        to, or `None` if it does not exist
+        """
+        path = self.basedir / template_path
+        if self.tx is not None:
+            return self.tx.read(path) if self.tx.exists(path) else None
+        try:
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
 
-    def write(self, template_path: str, force: bool = True) -> None:
+    def get_inputs(self, template_path: str) -> str | None:
+        """
+        Return a digest of everything that rendering ``template_path`` depends
+        on, or `None` if this cannot be determined
+        """
+        deps = get_template_deps(self.jinja_env, f"{template_path}.j2")
+        if deps is None:
+            return None
+        fp = Fingerprint()
+        for source in deps.sources:
+            fp.add_data(source)
+        for var in sorted(deps.variables):
+            if var in self.context:
+                value = json.dumps(self.context[var], sort_keys=True, default=str)
+                fp.add_data(f"{var}={value}")
+            else:
+                fp.add_data(f"{var}:-")
+        for name in sorted(deps.filters):
+            if (statefunc := FILTER_STATE.get(name)) is not None:
+                fp.add_data(f"|{name}={statefunc()}")
+        return fp.hexdigest()
+
+    def is_current(self, template_path: str, current: str | None) -> bool:
+        """
+        Test whether the manifest shows that ``current`` is the output of
+        rendering ``template_path`` with its current inputs
+        """
+        if self.manifest is None or current is None:
+            return False
+        inputs = self.get_inputs(template_path)
+        return inputs is not None and self.manifest.is_current(
+            template_path, inputs, current
+        )
+
+    def record(self, template_path: str, content: str) -> None:
+        if self.manifest is not None:
+            if (inputs := self.get_inputs(template_path)) is not None:
+                self.manifest.record(template_path, inputs, content)
+
+    def write(self, template_path: str, force: bool = True) -> bool:
+        """
+        Render ``template_path`` and write the result to the corresponding
+        file if its contents differ.  Returns `True` iff the file was written.
+        """
         outpath = self.basedir / template_path
-        if not force and outpath.exists():
+        current = self.read_current(template_path)
+        if not force and current is not None:
             log.info("File %s already exists; not templating", template_path)
-            return
+            return False
+        if self.is_current(template_path, current):
+            log.info("File %s is up to date", template_path)
+            return False
+        content = self.render(template_path)
+        if current == content:
+            log.info("File %s is up to date", template_path)
+            self.record(template_path, content)
+            return False
         log.info("Writing %s ...", template_path)
-        outpath.parent.mkdir(parents=True, exist_ok=True)
-        outpath.write_text(self.render(template_path), encoding="utf-8")
+        if self.tx is not None:
+            self.tx.write(outpath, content)
+        else:
+            outpath.parent.mkdir(parents=True, exist_ok=True)
+            outpath.write_text(content, encoding="utf-8")
+        self.record(template_path, content)
+        return True
+
+    def diff(self, template_path: str) -> str:
+        """
+        Return a unified diff from the current contents of the file that
+        ``template_path`` renders to to the rendered template.  If they are
+        the same, the empty string is returned.  The manifest is consulted but
+        not updated.
+        """
+        old = self.read_current(template_path)
+        if self.is_current(template_path, old):
+            return ""
+        new = self.render(template_path)
+        return "".join(
+            unified_diff(
+                (old or "").splitlines(keepends=True),
+                new.splitlines(keepends=True),
+                fromfile=f"a/{template_path}" if old is not None else "/dev/null",
+                tofile=f"b/{template_path}",
+            )
+        )
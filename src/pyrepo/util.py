@@ -1,8 +1,11 @@
 from __future__ import annotations
 from collections.abc import Callable, Iterable, Iterator
-from datetime import date
+from dataclasses import dataclass, field
+from datetime import date, timedelta
 from enum import Enum
-from functools import partial, wraps
+from functools import cache, wraps
+from importlib.resources import files
+import json
 import logging
 from operator import attrgetter
 from pathlib import Path
@@ -12,17 +15,45 @@ import subprocess
 import sys
 from textwrap import fill
 import time
-from typing import Any, TextIO
+from typing import Any, Generic, TextIO, TypeVar, overload
 from in_place import InPlace
 from intspan import intspan
-from jinja2 import Environment, PackageLoader
+import jinja2
+from jinja2 import (
+    BaseLoader,
+    BytecodeCache,
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    ModuleLoader,
+    PackageLoader,
+)
 from linesep import ascii_splitlines
 from packaging.specifiers import SpecifierSet
 from packaging.version import Version
-from pyversion_info import VersionDatabase
+from pyversion_info import DATA_URL, VersionDatabase
+import requests
+from . import __version__
+from .cache import CacheFile, get_cache_dir, is_offline
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+#: Options for the Jinja environment that affect how templates are compiled.
+#: These are also read by :file:`hatch_build.py` when precompiling the
+#: templates.
+JINJA_OPTIONS: dict[str, Any] = json.loads(
+    (files("pyrepo") / "data" / "jinja-options.json").read_text(encoding="utf-8")
+)
+
+#: Directory containing the templates precompiled when building a wheel
+COMPILED_TEMPLATES_DIR = Path(__file__).with_name("_compiled_templates")
+
+#: How long a downloaded copy of the Python version database is used before
+#: pyrepo tries to fetch a new one
+VERSION_DB_TTL = timedelta(days=1)
+
 
 class PyVersion(str):
     __slots__ = ("major", "minor")
@@ -78,6 +109,47 @@ class PyVersion(str):
         return f"py{self.major}{self.minor}"
 
 
+class Deferred(Generic[T]):
+    """
+    A value to be computed on first access to a `LazyField` by calling
+    ``func`` on the object that the field belongs to
+    """
+
+    def __init__(self, func: Callable[[Any], T]) -> None:
+        self.func = func
+
+
+class LazyField(Generic[T]):
+    """
+    A dataclass field descriptor that can be set to a `Deferred`, in which case
+    the value is computed the first time the field is accessed.  Fields using
+    this descriptor are always required arguments to the dataclass
+    constructor.
+    """
+
+    def __set_name__(self, _owner: type, name: str) -> None:
+        self.name = name
+
+    @overload
+    def __get__(self, obj: None, owner: type) -> LazyField[T]: ...
+
+    @overload
+    def __get__(self, obj: object, owner: type) -> T: ...
+
+    def __get__(self, obj: object | None, owner: type) -> Any:
+        if obj is None:
+            # Raise an AttributeError so that dataclasses don't treat the
+            # descriptor as a default value
+            raise AttributeError(f"{owner.__name__}.{self.name}")
+        value = obj.__dict__[self.name]
+        if isinstance(value, Deferred):
+            value = obj.__dict__[self.name] = value.func(obj)
+        return value
+
+    def __set__(self, obj: object, value: T | Deferred[T]) -> None:
+        obj.__dict__[self.name] = value
+
+
 def runcmd(*args: str | Path, **kwargs: Any) -> subprocess.CompletedProcess:
     log.debug("Running: %s", shlex.join(map(str, args)))
     kwargs.setdefault("check", True)
@@ -92,15 +164,36 @@ def readcmd(*args: str | Path, **kwargs: Any) -> str:
     return r.stdout.strip()
 
 
-def ensure_license_years(filepath: str | Path, years: list[int]) -> None:
-    map_lines(
-        filepath,
-        partial(
-            replace_group,
-            r"^Copyright \(c\) (\d[-,\d\s]+\d) \w+",
-            lambda ys: update_years2str(ys, years),
-        ),
-    )
+def streamcmd(*args: str | Path, **kwargs: Any) -> Iterator[str]:
+    """
+    Run a command and yield the lines of its output (without trailing
+    newlines) as they are produced.  Raises `subprocess.CalledProcessError`
+    once the output is exhausted if the command failed.
+    """
+    log.debug("Running: %s", shlex.join(map(str, args)))
+    with subprocess.Popen(args, stdout=subprocess.PIPE, text=True, **kwargs) as proc:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            yield line.rstrip("\n")
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, args)
+
+
+LICENSE_YEARS_RGX = re.compile(r"^Copyright \(c\) (\d[-,\d\s]+\d) \w+")
+
+
+def ensure_license_years(filepath: str | Path, years: list[int]) -> bool:
+    """
+    Update the copyright years in the license file at ``filepath`` to include
+    ``years``.  Returns `True` iff the file was modified.
+    """
+    return LineRewriter(
+        [
+            LineRule.replace_group(
+                LICENSE_YEARS_RGX, lambda ys: update_years2str(ys, years)
+            )
+        ]
+    ).rewrite_file(filepath)
 
 
 def years2str(years: list[int]) -> str:
@@ -119,15 +212,67 @@ def update_years2str(year_str: str, years: list[int] | None = None) -> str:
     return years2str(yearspan)
 
 
+@cache
+def get_version_database() -> VersionDatabase:
+    """
+    Return the `pyversion_info` database of Python versions.  The database is
+    downloaded at most once per process, and the download is cached on disk
+    for `VERSION_DB_TTL`.  If the database cannot be downloaded (or pyrepo is
+    offline), a stale download is used if there is one; otherwise, a snapshot
+    bundled with pyrepo is used.
+    """
+    cachefile = CacheFile(get_cache_dir() / "pyversion-info-data.json")
+    if not is_offline():
+        try:
+            age = time.time() - cachefile.path.stat().st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is not None and age < VERSION_DB_TTL.total_seconds():
+            if (data := cachefile.load(DATA_URL)) is not None:
+                return VersionDatabase.parse_obj(data)
+        try:
+            log.debug("Fetching Python version database from %s", DATA_URL)
+            r = requests.get(DATA_URL, timeout=10)
+            r.raise_for_status()
+            data = r.json()
+            db = VersionDatabase.parse_obj(data)
+        except (requests.RequestException, ValueError) as e:
+            log.warning("Could not fetch Python version database: %s", e)
+        else:
+            cachefile.store(DATA_URL, data)
+            return db
+    if (data := cachefile.load(DATA_URL)) is not None:
+        log.debug("Using previously-fetched Python version database")
+        return VersionDatabase.parse_obj(data)
+    log.debug("Using bundled Python version database")
+    with (files("pyrepo") / "data" / "pyversion-info-data.json").open(
+        encoding="utf-8"
+    ) as fp:
+        return VersionDatabase.parse_obj(json.load(fp))
+
+
+def version_database_state() -> str:
+    return get_version_database().last_modified.isoformat()
+
+
+#: For Jinja filters whose output depends on external data and not just on
+#: their arguments, functions returning a string that identifies the current
+#: state of that data
+FILTER_STATE: dict[str, Callable[[], str]] = {
+    "major_pypy_supported": version_database_state,
+    "pypy_supported": version_database_state,
+}
+
+
 def cpython_supported() -> list[str]:
-    pyvinfo = VersionDatabase.fetch().cpython
+    pyvinfo = get_version_database().cpython
     return [v for v in pyvinfo.minor_versions() if pyvinfo.is_supported(v)]
 
 
 def pypy_supported(cpython_versions: list[PyVersion]) -> list[PyVersion]:
     # Returns the subset of `cpython_versions` that are supported by the latest
     # PyPy minor version
-    info = VersionDatabase.fetch().pypy
+    info = get_version_database().pypy
     *_, latest_series = filter(info.is_released, info.minor_versions())
     pypy_supports = set(
         map(PyVersion.parse, info.supported_cpython_series(latest_series))
@@ -138,7 +283,7 @@ def pypy_supported(cpython_versions: list[PyVersion]) -> list[PyVersion]:
 def major_pypy_supported(cpython_versions: list[PyVersion]) -> list[int]:
     # Returns the subset of major versions of `cpython_versions` that are
     # supported by the latest PyPy minor version
-    info = VersionDatabase.fetch().pypy
+    info = get_version_database().pypy
     *_, latest_series = filter(info.is_released, info.minor_versions())
     pypy_supports = {
         PyVersion.parse(v).major for v in info.supported_cpython_series(latest_series)
@@ -146,19 +291,64 @@ def major_pypy_supported(cpython_versions: list[PyVersion]) -> list[int]:
     return sorted(pypy_supports.intersection(v.major for v in cpython_versions))
 
 
+@cache
 def get_jinja_env() -> Environment:
+    """
+    Return the Jinja environment for pyrepo's templates.  A single environment
+    is shared by the whole process, and compiled templates are additionally
+    cached on disk.
+    """
     jenv = Environment(
-        loader=PackageLoader("pyrepo", "templates"),
-        trim_blocks=True,
-        lstrip_blocks=True,
+        loader=get_template_loader(),
+        bytecode_cache=get_bytecode_cache(),
+        **JINJA_OPTIONS,
     )
-    jenv.filters["major_pypy_supported"] = major_pypy_supported
-    jenv.filters["pypy_supported"] = pypy_supported
-    jenv.filters["rewrap"] = rewrap
-    jenv.filters["years2str"] = years2str
+    # The filters look up their implementations when called rather than now so
+    # that the latter can be swapped out after the environment is created
+    # (e.g., by tests)
+    jenv.filters["major_pypy_supported"] = lambda v: major_pypy_supported(v)
+    jenv.filters["pypy_supported"] = lambda v: pypy_supported(v)
+    jenv.filters["rewrap"] = lambda s: rewrap(s)
+    jenv.filters["years2str"] = lambda ys: years2str(ys)
     return jenv
 
 
+def get_template_loader() -> BaseLoader:
+    """
+    Return a loader for pyrepo's templates that uses the templates precompiled
+    at build time (see :file:`hatch_build.py`), if any, that were compiled
+    with the current Jinja version and options
+    """
+    loader = PackageLoader("pyrepo", "templates")
+    try:
+        with (COMPILED_TEMPLATES_DIR / "manifest.json").open(encoding="utf-8") as fp:
+            manifest = json.load(fp)
+    except FileNotFoundError:
+        # Development checkout
+        return loader
+    except (OSError, ValueError) as e:
+        log.debug("Could not read precompiled template manifest: %s", e)
+        return loader
+    if manifest != {"jinja2": jinja2.__version__, "options": JINJA_OPTIONS}:
+        log.debug("Precompiled templates are out of date; not using")
+        return loader
+    return ChoiceLoader([ModuleLoader(COMPILED_TEMPLATES_DIR), loader])
+
+
+def get_bytecode_cache() -> BytecodeCache | None:
+    cachedir = get_cache_dir() / "templates"
+    try:
+        cachedir.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        log.debug("Not caching compiled templates: %s", e)
+        return None
+    # Include the pyrepo version in the filenames so that stale bytecode from
+    # other versions is never used
+    return FileSystemBytecodeCache(
+        str(cachedir), pattern=f"pyrepo-{__version__}-%s.cache"
+    )
+
+
 def rewrap(s: str) -> str:
     return fill(
         s.replace("\n", " "),
@@ -185,32 +375,119 @@ def sort_specifier(specset: SpecifierSet) -> str:
     return ", ".join(map(str, sorted(specset, key=attrgetter("version"))))
 
 
-def replace_group(
-    rgx: str | re.Pattern[str],
-    replacer: str | Callable[[str], str],
-    s: str,
-    group: int | str = 1,
-) -> str:
-    if m := re.search(rgx, s):
-        if isinstance(replacer, str):
-            repl = replacer
+@dataclass
+class LineRule:
+    """
+    A rule for `LineRewriter`: a precompiled regex and what to do with lines
+    that it matches
+    """
+
+    pattern: re.Pattern[str]
+    #: Function that is passed the match object (and the line) for a matching
+    #: line and returns the line's replacement text (which may consist of
+    #: multiple lines or be empty) or `None` to delete the line
+    action: Callable[[re.Match[str], str], str | None]
+    #: If true, the pattern must match the whole line (minus the trailing
+    #: newline); otherwise, it may match anywhere in the line
+    fullmatch: bool = False
+
+    @classmethod
+    def replace_group(
+        cls,
+        rgx: str | re.Pattern[str],
+        replacer: str | Callable[[str], str],
+        group: int | str = 1,
+    ) -> LineRule:
+        """
+        Create a rule that replaces the text matched by ``group`` of ``rgx``
+        with either ``replacer`` (if it is a string) or the result of calling
+        ``replacer`` on the text
+        """
+
+        def action(m: re.Match[str], line: str) -> str:
+            if isinstance(replacer, str):
+                repl = replacer
+            else:
+                repl = replacer(m[group])
+            return line[: m.start(group)] + repl + line[m.end(group) :]
+
+        return cls(re.compile(rgx), action)
+
+    @classmethod
+    def replace_line(
+        cls, rgx: str | re.Pattern[str], replacement: str | Callable[[str], str]
+    ) -> LineRule:
+        """
+        Create a rule that replaces whole lines matching ``rgx`` with either
+        ``replacement`` (if it is a string) or the result of calling
+        ``replacement`` on the line
+        """
+        if isinstance(replacement, str):
+            text = replacement
+            return cls(re.compile(rgx), lambda _m, _line: text, fullmatch=True)
         else:
-            repl = replacer(m[group])
-        s = s[: m.start(group)] + repl + s[m.end(group) :]
-    return s
+            func = replacement
+            return cls(re.compile(rgx), lambda _m, line: func(line), fullmatch=True)
 
+    @classmethod
+    def delete_line(cls, rgx: str | re.Pattern[str]) -> LineRule:
+        """Create a rule that deletes whole lines matching ``rgx``"""
+        return cls(re.compile(rgx), lambda _m, _line: None, fullmatch=True)
 
-def map_lines(filepath: str | Path, func: Callable[[str], str]) -> None:
-    with InPlace(filepath, mode="t", encoding="utf-8") as fp:
-        for line in fp:
-            print(func(line), file=fp, end="")
+    def match(self, line: str) -> re.Match[str] | None:
+        if self.fullmatch:
+            return self.pattern.fullmatch(line.rstrip("\r\n"))
+        else:
+            return self.pattern.search(line)
 
 
-def maybe_map_lines(filepath: str | Path, func: Callable[[str], str | None]) -> None:
-    with InPlace(filepath, mode="t", encoding="utf-8") as fp:
-        for line in fp:
-            if (newline := func(line)) is not None:
-                print(newline, file=fp, end="")
+@dataclass
+class LineRewriter:
+    """
+    Applies a list of `LineRule`\\s to each line of a file in a single pass.
+    Each line is rewritten by the first rule that matches it (if any), and the
+    number of lines matched by each rule is counted in `counts`.
+    """
+
+    rules: list[LineRule]
+    counts: list[int] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * len(self.rules)
+
+    def rewrite_line(self, line: str) -> str | None:
+        for i, rule in enumerate(self.rules):
+            if m := rule.match(line):
+                self.counts[i] += 1
+                return rule.action(m, line)
+        return line
+
+    def rewrite(self, lines: Iterable[str]) -> Iterator[str]:
+        for line in lines:
+            if (newline := self.rewrite_line(line)) is not None:
+                yield newline
+
+    def rewrite_file(self, filepath: str | Path) -> bool:
+        """
+        Rewrite the file at ``filepath``.  If this would not change the file's
+        contents, the file is left untouched.  Returns `True` iff the file was
+        modified.
+        """
+        with open(filepath, encoding="utf-8") as fp:
+            content = fp.read()
+        new_content = "".join(self.rewrite(ascii_splitlines(content, keepends=True)))
+        self.log_counts(filepath)
+        if new_content == content:
+            log.debug("No changes to %s", filepath)
+            return False
+        with InPlace(filepath, mode="t", encoding="utf-8") as fp:
+            fp.write(new_content)
+        log.info("Modified %s", filepath)
+        return True
+
+    def log_counts(self, filepath: str | Path) -> None:
+        for rule, n in zip(self.rules, self.counts):
+            log.debug("%s: %d line(s) matched %r", filepath, n, rule.pattern.pattern)
 
 
 def cpe_no_tb(func: Callable) -> Callable:
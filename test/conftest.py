@@ -1,10 +1,21 @@
 from __future__ import annotations
+from collections.abc import Iterator
 import logging
 import pytest
 from pytest_mock import MockerFixture
 from pyrepo import util
 
 
+@pytest.fixture(autouse=True, scope="session")
+def user_cache_dir(tmp_path_factory: pytest.TempPathFactory) -> Iterator[None]:
+    # Keep the tests from writing to the real user cache directory or
+    # accessing the network
+    with pytest.MonkeyPatch.context() as m:
+        m.setenv("PYREPO_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+        m.setenv("PYREPO_OFFLINE", "1")
+        yield
+
+
 @pytest.fixture(autouse=True)
 def capture_all_logs(caplog: pytest.LogCaptureFixture) -> None:
     caplog.set_level(logging.DEBUG, logger="pyrepo")
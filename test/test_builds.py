@@ -0,0 +1,129 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from shutil import copytree
+import sys
+import time
+from typing import Any
+import pytest
+from pytest_mock import MockerFixture
+from pyrepo.builds import BUILD_ENV_MARKER, BUILD_ENV_TTL, prepare_build_env
+import pyrepo.project
+from pyrepo.project import Project
+from test_helpers import DATA_DIR
+
+
+def test_prepare_build_env(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("PYREPO_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("PYREPO_OFFLINE")
+    fail = False
+
+    def fake_runcmd(*args: Any, **_kwargs: Any) -> None:
+        if args[1:3] == ("-m", "venv"):
+            Path(args[3]).mkdir(parents=True)
+        elif fail:
+            raise RuntimeError("pip failed")
+
+    runcmd = mocker.patch("pyrepo.builds.runcmd", side_effect=fake_runcmd)
+    python = prepare_build_env(["hatchling", "versioningit"])
+    envdir = python.parent.parent
+    assert envdir.parent == tmp_path / "build-envs"
+    assert runcmd.call_count == 2
+    assert runcmd.call_args_list[0].args[:3] == (sys.executable, "-m", "venv")
+    assert runcmd.call_args_list[1].args[0] == python
+    assert runcmd.call_args_list[1].args[-3:] == ("build", "hatchling", "versioningit")
+    assert (envdir / BUILD_ENV_MARKER).exists()
+    # The same requirements (in any order) reuse the environment
+    assert prepare_build_env(["versioningit", "hatchling"]) == python
+    assert runcmd.call_count == 2
+    # Different requirements get a different environment
+    other = prepare_build_env(["setuptools"])
+    assert other != python
+    assert runcmd.call_count == 4
+    # Expired environments are recreated, unless offline
+    old = time.time() - BUILD_ENV_TTL.total_seconds() - 60
+    os.utime(envdir / BUILD_ENV_MARKER, (old, old))
+    monkeypatch.setenv("PYREPO_OFFLINE", "1")
+    assert prepare_build_env(["hatchling", "versioningit"]) == python
+    assert runcmd.call_count == 4
+    monkeypatch.delenv("PYREPO_OFFLINE")
+    assert prepare_build_env(["hatchling", "versioningit"]) == python
+    assert runcmd.call_count == 6
+    # Environments that fail to be prepared are removed
+    fail = True
+    with pytest.raises(RuntimeError):
+        prepare_build_env(["flit_core"])
+    assert sorted((tmp_path / "build-envs").iterdir()) == sorted(
+        [envdir, other.parent.parent]
+    )
+
+
+BACKEND = """\
+from pathlib import Path
+
+
+def get_requires_for_build_sdist(config_settings=None):
+    return []
+
+
+def get_requires_for_build_wheel(config_settings=None):
+    return ["Jinja2"]
+
+
+def build_sdist(sdist_directory, config_settings=None):
+    Path(sdist_directory, "foobar-0.1.0.tar.gz").touch()
+    return "foobar-0.1.0.tar.gz"
+
+
+def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
+    Path(wheel_directory, "foobar-0.1.0-py3-none-any.whl").touch()
+    return "foobar-0.1.0-py3-none-any.whl"
+"""
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Uses a POSIX shell script")
+def test_build_dynamic_requires(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("PYREPO_CACHE_DIR", str(tmp_path / "cache"))
+    projdir = tmp_path / "project"
+    copytree(DATA_DIR / "inspect_project" / "has-ci", projdir)
+    pyproject = projdir / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text().replace(
+            'requires = ["hatchling"]\nbuild-backend = "hatchling.build"\n',
+            'requires = []\nbuild-backend = "backend"\nbackend-path = ["_backend"]\n',
+        )
+    )
+    (projdir / "_backend").mkdir()
+    (projdir / "_backend" / "backend.py").write_text(BACKEND)
+    installed: list[list[str]] = []
+
+    def fake_runcmd(*args: Any, **_kwargs: Any) -> None:
+        if args[1:3] == ("-m", "venv"):
+            # Stand in for a virtual environment with the requirements already
+            # available
+            python = Path(args[3], "bin", "python")
+            python.parent.mkdir(parents=True)
+            python.write_text(f'#!/bin/sh\nexec {sys.executable} "$@"\n')
+            python.chmod(0o755)
+        else:
+            assert args[1:4] == ("-m", "pip", "install")
+            installed.append([str(a) for a in args[6:]])
+
+    mocker.patch("pyrepo.builds.runcmd", side_effect=fake_runcmd)
+    runcmd = mocker.spy(pyrepo.project, "runcmd")
+    with Project.from_directory(projdir) as proj:
+        proj.build()
+    # An environment with the static requirements is used to find the dynamic
+    # requirements, which are then installed in an environment of their own
+    assert installed == [["build"], ["build", "Jinja2"]]
+    python = runcmd.call_args.args[0]
+    assert python == prepare_build_env(["Jinja2"])
+    assert "--no-isolation" in runcmd.call_args.args
+    assert sorted(p.name for p in (projdir / "dist").iterdir()) == [
+        "foobar-0.1.0-py3-none-any.whl",
+        "foobar-0.1.0.tar.gz",
+    ]
@@ -1,8 +1,9 @@
+from io import StringIO
 import json
 from operator import attrgetter
 from pathlib import Path
 import pytest
-from pyrepo.changelog import Changelog
+from pyrepo.changelog import Changelog, ChangelogSection
 from test_helpers import DATA_DIR
 
 
@@ -16,3 +17,26 @@ def test_changelog(filepath: Path) -> None:
         chlog = Changelog.load(fp)
     assert chlog.for_json() == json.loads(filepath.with_suffix(".json").read_text())
     assert str(chlog) == filepath.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    "filepath",
+    [p for p in (DATA_DIR / "changelog").iterdir() if p.suffix in (".md", ".rst")],
+    ids=attrgetter("name"),
+)
+@pytest.mark.parametrize("content", ["", "- Change", "- Change\n\n  More"])
+def test_changelog_lazy(filepath: Path, content: str) -> None:
+    text = filepath.read_text(encoding="utf-8")
+    lazy = Changelog.load(StringIO(text), lazy=True)
+    assert str(lazy) == text
+    full = Changelog.load(StringIO(text))
+    # Editing the head of a lazily-loaded changelog gives the same result as
+    # editing a fully-loaded one
+    for chlog in (lazy, full):
+        if chlog.sections:
+            chlog.sections[0].content = content
+            chlog.sections.insert(
+                0, ChangelogSection(version=None, release_date=None, content=content)
+            )
+    assert str(lazy) == str(full)
+    assert lazy.for_json() == full.for_json()
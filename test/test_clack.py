@@ -2,7 +2,11 @@ from __future__ import annotations
 from typing import Any
 import click
 import pytest
-from pyrepo.clack import ConfigurableCommand, ConfigurableGroup
+from pyrepo.clack import (
+    ConfigurableCommand,
+    ConfigurableGroup,
+    LazyConfigurableGroup,
+)
 
 
 @click.group(cls=ConfigurableGroup, allow_config=["foo"])
@@ -48,3 +52,51 @@ def runcmd(**_: Any) -> None:
 def test_process_config(cfgin: dict[str, Any], cfgout: dict[str, Any]) -> None:
     assert isinstance(main, ConfigurableGroup)
     assert main.process_config(cfgin) == cfgout
+
+
+@pytest.mark.parametrize(
+    "cfgin,cfgout,loaded",
+    [
+        (
+            {"foo": "red", "subcmd": {"gnusto": 42, "foo-bar": True}},
+            {"foo": "red", "subcmd": {"gnusto": "42", "foo_bar": "True"}},
+            ["subcmd"],
+        ),
+        (
+            {"bar": "green", "subcmd": {"cleesh": "baz"}, "runcmd": {"quux": 17}},
+            {"subcmd": {}},
+            ["runcmd", "subcmd"],
+        ),
+        ({"subcmd": "notadict", "nosuchcmd": {}}, {}, []),
+    ],
+)
+def test_lazy_process_config(
+    cfgin: dict[str, Any], cfgout: dict[str, Any], loaded: list[str]
+) -> None:
+    lazy_main = LazyConfigurableGroup(
+        name="lazy-main",
+        params=main.params,
+        allow_config=["foo"],
+        lazy_commands={
+            "subcmd": "test_clack:subcmd",
+            "runcmd": "test_clack:runcmd",
+        },
+    )
+    assert lazy_main.process_config(cfgin) == cfgout
+    assert sorted(lazy_main.commands) == loaded
+
+
+def test_lazy_get_command() -> None:
+    lazy_main = LazyConfigurableGroup(
+        name="lazy-main",
+        lazy_commands={
+            "subcmd": "test_clack:subcmd",
+            "runcmd": "test_clack:runcmd",
+        },
+    )
+    ctx = click.Context(lazy_main)
+    assert lazy_main.list_commands(ctx) == ["runcmd", "subcmd"]
+    assert lazy_main.commands == {}
+    assert lazy_main.get_command(ctx, "runcmd") is runcmd
+    assert lazy_main.get_command(ctx, "nosuchcmd") is None
+    assert list(lazy_main.commands) == ["runcmd"]
@@ -2,11 +2,13 @@ import os
 from pathlib import Path
 from shutil import copytree
 from click.testing import CliRunner
+import pytest
 from pytest_mock import MockerFixture
 from pyrepo.__main__ import main
 from test_helpers import assert_dirtrees_eq, case_dirs, mock_git, show_result
 
 
+@pytest.mark.usefixtures("mock_pypy_supported")
 @case_dirs("add_typing")
 def test_pyrepo_add_typing(
     dirpath: Path, mocker: MockerFixture, tmp_path: Path
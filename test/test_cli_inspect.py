@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import json
+from multiprocessing import get_context
+import os
+from pathlib import Path
+from click.testing import CliRunner
+import pytest
+from pytest_mock import MockerFixture
+from pyrepo.__main__ import main
+from test_helpers import DATA_DIR, mock_git, show_result
+
+
+def test_pyrepo_inspect_current(mocker: MockerFixture) -> None:
+    mock_git(mocker, get_default_branch="master")
+    dirpath = DATA_DIR / "inspect_project" / "has-ci"
+    r = CliRunner().invoke(
+        main,
+        ["-c", os.devnull, "-C", str(dirpath), "inspect"],
+        standalone_mode=False,
+    )
+    assert r.exit_code == 0, show_result(r)
+    assert json.loads(r.output) == json.loads((dirpath / "_inspect.json").read_text())
+
+
+@pytest.mark.parametrize("from_file", [False, True])
+def test_pyrepo_inspect_many(
+    from_file: bool, mocker: MockerFixture, tmp_path: Path
+) -> None:
+    mock_git(mocker, get_default_branch="master")
+    dirpaths = [
+        DATA_DIR / "inspect_project" / "has-ci",
+        DATA_DIR / "inspect_project" / "no-pyproject",
+        DATA_DIR / "inspect_project" / "typed",
+    ]
+    if from_file:
+        listfile = tmp_path / "projects.txt"
+        listfile.write_text("".join(f"{p}\n" for p in dirpaths))
+        args = ["--from-file", str(listfile)]
+    else:
+        args = list(map(str, dirpaths))
+    r = CliRunner().invoke(
+        main,
+        ["-c", os.devnull, "inspect", "--jobs", "1", *args],
+        standalone_mode=False,
+    )
+    assert r.exit_code == 1, show_result(r)
+    records = [json.loads(line) for line in r.output.splitlines()]
+    assert records == [
+        {
+            "path": str(dirpaths[0]),
+            "details": json.loads((dirpaths[0] / "_inspect.json").read_text()),
+        },
+        {
+            "path": str(dirpaths[1]),
+            "error": "InvalidProjectError: Project is missing pyproject.toml file",
+        },
+        {
+            "path": str(dirpaths[2]),
+            "details": json.loads((dirpaths[2] / "_inspect.json").read_text()),
+        },
+    ]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Requires fork()")
+@pytest.mark.filterwarnings("ignore:.*use of fork\\(\\) may lead to deadlocks")
+def test_pyrepo_inspect_many_jobs(mocker: MockerFixture) -> None:
+    mock_git(mocker, get_default_branch="master")
+    # Fork the worker processes so that they inherit the mock
+    mocker.patch(
+        "pyrepo.commands.inspect.ProcessPoolExecutor",
+        partial(ProcessPoolExecutor, mp_context=get_context("fork")),
+    )
+    dirpaths = [
+        DATA_DIR / "inspect_project" / "has-ci",
+        DATA_DIR / "inspect_project" / "no-pyproject",
+        DATA_DIR / "inspect_project" / "typed",
+        DATA_DIR / "inspect_project" / "flat-req",
+    ]
+    r = CliRunner().invoke(
+        main,
+        ["-c", os.devnull, "inspect", "--jobs", "2", *map(str, dirpaths)],
+        standalone_mode=False,
+    )
+    assert r.exit_code == 1, show_result(r)
+    # Records are output in order of completion, which is nondeterministic
+    records = sorted(
+        (json.loads(line) for line in r.output.splitlines()),
+        key=lambda rec: rec["path"],
+    )
+    expected = [
+        (
+            {
+                "path": str(p),
+                "error": "InvalidProjectError: Project is missing pyproject.toml file",
+            }
+            if p.name == "no-pyproject"
+            else {
+                "path": str(p),
+                "details": json.loads((p / "_inspect.json").read_text()),
+            }
+        )
+        for p in dirpaths
+    ]
+    assert records == sorted(expected, key=lambda rec: rec["path"])
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from shutil import copytree
+from click.testing import CliRunner
+import pytest
+from pytest_mock import MockerFixture
+from pyrepo.__main__ import main
+from pyrepo.tmpltr import TemplateWriter
+from test_helpers import DATA_DIR, mock_git, show_result
+
+
+def run_template(dirpath: Path, *args: str) -> tuple[int, str]:
+    r = CliRunner().invoke(
+        main,
+        ["-c", os.devnull, "-C", str(dirpath), "template", *args],
+        standalone_mode=False,
+    )
+    if isinstance(r.exception, SystemExit):
+        return (r.exception.code, r.output)  # type: ignore[return-value]
+    assert r.exit_code == 0, show_result(r)
+    return (r.exit_code, r.output)
+
+
+@pytest.mark.usefixtures("mock_pypy_supported")
+def test_pyrepo_template_all(mocker: MockerFixture, tmp_path: Path) -> None:
+    mock_git(mocker, get_default_branch="master")
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(DATA_DIR / "inspect_project" / "has-ci", tmp_path)
+    readme = (tmp_path / "README.rst").read_text()
+    assert run_template(tmp_path, "--all")[0] == 0
+    # Hand-maintained files are left alone
+    assert (tmp_path / "README.rst").read_text() == readme
+    assert (tmp_path / ".github" / "renovate.json5").exists()
+    assert run_template(tmp_path, "--all", "--check") == (0, "")
+
+    toxfile = tmp_path / "tox.ini"
+    mtime = toxfile.stat().st_mtime_ns
+    # Files whose contents are already correct are not rewritten
+    assert run_template(tmp_path, "--all")[0] == 0
+    assert toxfile.stat().st_mtime_ns == mtime
+
+    toxfile.write_text(toxfile.read_text() + "\n[testenv:extra]\n")
+    assert run_template(tmp_path, "--all", "--check") == (1, "")
+    rc, output = run_template(tmp_path, "--all", "--diff")
+    assert rc == 0
+    assert output.startswith("--- a/tox.ini\n+++ b/tox.ini\n")
+    assert "-[testenv:extra]\n" in output
+    # Neither --check nor --diff writes anything
+    assert toxfile.read_text().endswith("\n[testenv:extra]\n")
+    assert run_template(tmp_path, "tox.ini")[0] == 0
+    assert run_template(tmp_path, "--all", "--check") == (0, "")
+
+
+@pytest.mark.usefixtures("mock_pypy_supported")
+def test_pyrepo_template_manifest(mocker: MockerFixture, tmp_path: Path) -> None:
+    mock_git(mocker, get_default_branch="master")
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(DATA_DIR / "inspect_project" / "has-ci", tmp_path)
+    (tmp_path / ".git").mkdir()
+    spy = mocker.spy(TemplateWriter, "render")
+    manifest = tmp_path / ".git" / "pyrepo-cache" / "templates.json"
+    # Checking doesn't record anything
+    assert run_template(tmp_path, "--all", "--check")[0] == 1
+    assert run_template(tmp_path, "--all", "--diff")[0] == 0
+    assert not manifest.exists()
+    spy.reset_mock()
+    assert run_template(tmp_path, "--all")[0] == 0
+    rendered = spy.call_count
+    assert rendered > 0
+    assert manifest.exists()
+    # Nothing has changed, so nothing is rendered
+    assert run_template(tmp_path, "--all", "--check") == (0, "")
+    assert run_template(tmp_path, "--all")[0] == 0
+    assert spy.call_count == rendered
+    # Only the template whose output file was edited is re-rendered
+    toxfile = tmp_path / "tox.ini"
+    content = toxfile.read_text()
+    toxfile.write_text(content + "\n[testenv:extra]\n")
+    assert run_template(tmp_path, "--all")[0] == 0
+    assert spy.call_count == rendered + 1
+    assert toxfile.read_text() == content
+    # Only templates using a changed input are re-rendered
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text().replace(
+            'description = "', 'description = "Now with more description: '
+        )
+    )
+    assert run_template(tmp_path, "--all")[0] == 0
+    renders = [c.args[1] for c in spy.call_args_list[rendered + 1 :]]
+    assert "pyproject.toml" in renders
+    assert ".pre-commit-config.yaml" not in renders
+    assert ".gitignore" not in renders
@@ -0,0 +1,69 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+import pytest
+from pytest_mock import MockerFixture
+from pyrepo.edit import EditTransaction
+from pyrepo.util import LineRewriter, LineRule
+
+
+def test_edit_transaction(tmp_path: Path) -> None:
+    foo = tmp_path / "foo.txt"
+    foo.write_text("foo\nbar\n")
+    foo.chmod(0o755)
+    same = tmp_path / "same.txt"
+    same.write_text("same\n")
+    gone = tmp_path / "gone.txt"
+    gone.write_text("gone\n")
+    new = tmp_path / "sub" / "new.txt"
+    tx = EditTransaction()
+    tx.rewrite(foo, LineRewriter([LineRule.replace_line(r"foo", "FOO\n")]))
+    tx.rewrite(foo, LineRewriter([LineRule.delete_line(r"bar")]))
+    assert tx.read(foo) == "FOO\n"
+    tx.rewrite(same, LineRewriter([LineRule.replace_line(r"same", "same\n")]))
+    tx.delete(gone)
+    assert not tx.exists(gone)
+    with pytest.raises(FileNotFoundError):
+        tx.read(gone)
+    assert not tx.exists(new)
+    tx.write(new, "new\n")
+    # Nothing is written until commit
+    assert foo.read_text() == "foo\nbar\n"
+    assert gone.exists()
+    assert not new.exists()
+    assert sorted(tx.get_changes()) == [foo, gone, new]
+    mtime = same.stat().st_mtime_ns
+    assert sorted(tx.commit()) == [foo, gone, new]
+    assert foo.read_text() == "FOO\n"
+    assert foo.stat().st_mode & 0o777 == 0o755
+    assert not gone.exists()
+    assert new.read_text() == "new\n"
+    assert same.stat().st_mtime_ns == mtime
+    assert tx.get_changes() == {}
+
+
+def test_edit_transaction_rollback(mocker: MockerFixture, tmp_path: Path) -> None:
+    first = tmp_path / "first.txt"
+    first.write_text("first\n")
+    second = tmp_path / "second.txt"
+    second.write_text("second\n")
+    tx = EditTransaction()
+    tx.write(first, "changed\n")
+    tx.write(second, "changed\n")
+    real_replace = os.replace
+    calls = 0
+
+    def flaky_replace(src: str, dest: str | Path) -> None:
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise OSError("Disk full")
+        real_replace(src, dest)
+
+    mocker.patch("os.replace", side_effect=flaky_replace)
+    with pytest.raises(OSError, match="Disk full"):
+        tx.commit()
+    # The file written before the failure is restored
+    assert first.read_text() == "first\n"
+    assert second.read_text() == "second\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["first.txt", "second.txt"]
@@ -1,9 +1,12 @@
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import subprocess
 import time
 import pytest
 from pytest_mock import MockerFixture
-from pyrepo.git import Git
+from pyrepo import util
+from pyrepo.git import CAT_FILE_POOL_SIZE, Git, RefReader
 from pyrepo.inspecting import InvalidProjectError
 
 
@@ -18,14 +21,17 @@ from pyrepo.inspecting import InvalidProjectError
     ],
 )
 def test_get_commit_years_include_now(
-    gitoutput: str, result: list[int], mocker: MockerFixture
+    gitoutput: str, result: list[int], mocker: MockerFixture, tmp_path: Path
 ) -> None:
     # Set current time to 2019-04-16T18:17:14Z:
     mlocaltime = mocker.patch("time.localtime", return_value=time.localtime(1555438634))
-    mreadcmd = mocker.patch("pyrepo.util.readcmd", return_value=gitoutput)
-    assert Git(dirpath=Path()).get_commit_years() == result
-    mreadcmd.assert_called_once_with(
-        "git", "log", "--format=%ad", "--date=format:%Y", cwd=Path()
+    mstreamcmd = mocker.patch(
+        "pyrepo.util.streamcmd", return_value=iter(gitoutput.splitlines())
+    )
+    # No `.git` directory, so the commit-year index is not used
+    assert Git(dirpath=tmp_path).get_commit_years() == result
+    mstreamcmd.assert_called_once_with(
+        "git", "log", "--format=%ad", "--date=format:%Y", cwd=tmp_path
     )
     mlocaltime.assert_called_once_with()
 
@@ -41,18 +47,66 @@ def test_get_commit_years_include_now(
     ],
 )
 def test_get_commit_years_no_include_now(
-    gitoutput: str, result: list[int], mocker: MockerFixture
+    gitoutput: str, result: list[int], mocker: MockerFixture, tmp_path: Path
 ) -> None:
     # Set current time to 2019-04-16T18:17:14Z:
     mlocaltime = mocker.patch("time.localtime", return_value=time.localtime(1555438634))
-    mreadcmd = mocker.patch("pyrepo.util.readcmd", return_value=gitoutput)
-    assert Git(dirpath=Path()).get_commit_years(include_now=False) == result
-    mreadcmd.assert_called_once_with(
-        "git", "log", "--format=%ad", "--date=format:%Y", cwd=Path()
+    mstreamcmd = mocker.patch(
+        "pyrepo.util.streamcmd", return_value=iter(gitoutput.splitlines())
+    )
+    assert Git(dirpath=tmp_path).get_commit_years(include_now=False) == result
+    mstreamcmd.assert_called_once_with(
+        "git", "log", "--format=%ad", "--date=format:%Y", cwd=tmp_path
     )
     mlocaltime.assert_not_called()
 
 
+def commit_in_year(repo: Path, year: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GIT_AUTHOR_DATE", f"{year}-06-15T12:00:00+00:00")
+    monkeypatch.setenv("GIT_COMMITTER_DATE", f"{year}-06-15T12:00:00+00:00")
+    subprocess.run(
+        ["git", "commit", "--allow-empty", "-q", "-m", f"Commit from {year}"],
+        cwd=repo,
+        check=True,
+    )
+
+
+def init_repo(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Test")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Test")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "test@example.com")
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+
+
+def test_get_commit_years_index(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    init_repo(tmp_path, monkeypatch)
+    for year in [2016, 2018, 2018]:
+        commit_in_year(tmp_path, year, monkeypatch)
+    repo = Git(dirpath=tmp_path)
+    spy = mocker.spy(repo, "read_commit_years")
+    assert repo.get_commit_years(include_now=False) == [2016, 2018]
+    assert (tmp_path / ".git" / "pyrepo-cache" / "commit-years.json").exists()
+    # Unchanged HEAD: nothing is walked
+    assert repo.get_commit_years(include_now=False) == [2016, 2018]
+    assert spy.call_count == 1
+    # New commits: only those are walked
+    commit_in_year(tmp_path, 2020, monkeypatch)
+    head = repo.get_head()
+    assert repo.get_commit_years(include_now=False) == [2016, 2018, 2020]
+    assert spy.call_count == 2
+    assert spy.call_args.args[0].endswith(f"..{head}")
+    # Rewritten history: the whole log is walked again
+    subprocess.run(["git", "reset", "-q", "--hard", "HEAD~2"], cwd=tmp_path, check=True)
+    commit_in_year(tmp_path, 2021, monkeypatch)
+    head = repo.get_head()
+    assert repo.get_commit_years(include_now=False) == [2016, 2018, 2021]
+    assert spy.call_count == 3
+    assert spy.call_args.args == (head,)
+
+
 @pytest.mark.parametrize(
     "gitoutput,result",
     [
@@ -61,15 +115,247 @@ def test_get_commit_years_no_include_now(
         ("foo\nmain\nmaster\nquux", "main"),
     ],
 )
-def test_get_default_branch(gitoutput: str, result: str, mocker: MockerFixture) -> None:
+def test_get_default_branch_cli(
+    gitoutput: str, result: str, mocker: MockerFixture, tmp_path: Path
+) -> None:
+    # No `.git` directory, so the refs can't be read directly
     m = mocker.patch("pyrepo.util.readcmd", return_value=gitoutput)
-    assert Git(dirpath=Path()).get_default_branch() == result
-    m.assert_called_once_with("git", "branch", "--format=%(refname:short)", cwd=Path())
+    assert Git(dirpath=tmp_path).get_default_branch() == result
+    m.assert_called_once_with(
+        "git", "branch", "--format=%(refname:short)", cwd=tmp_path
+    )
 
 
-def test_get_default_branch_error(mocker: MockerFixture) -> None:
+def test_get_default_branch_cli_error(mocker: MockerFixture, tmp_path: Path) -> None:
     m = mocker.patch("pyrepo.util.readcmd", return_value="foo\nquux")
     with pytest.raises(InvalidProjectError) as excinfo:
-        Git(dirpath=Path()).get_default_branch()
+        Git(dirpath=tmp_path).get_default_branch()
+    assert str(excinfo.value) == "Could not determine default Git branch"
+    m.assert_called_once_with(
+        "git", "branch", "--format=%(refname:short)", cwd=tmp_path
+    )
+
+
+def make_gitdir(gitdir: Path, refs: dict[str, str], packed: dict[str, str]) -> None:
+    (gitdir / "refs" / "heads").mkdir(parents=True)
+    (gitdir / "refs" / "tags").mkdir()
+    (gitdir / "HEAD").write_text("ref: refs/heads/main\n")
+    for name, value in refs.items():
+        p = gitdir / name
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(value + "\n")
+    if packed:
+        with (gitdir / "packed-refs").open("w") as fp:
+            print("# pack-refs with: peeled fully-peeled sorted", file=fp)
+            for name, oid in packed.items():
+                print(oid, name, file=fp)
+                print("^" + "f" * 40, file=fp)
+
+
+@pytest.mark.parametrize(
+    "refs,packed,result",
+    [
+        ({"refs/heads/main": "a" * 40}, {}, "main"),
+        ({"refs/heads/master": "a" * 40}, {}, "master"),
+        ({}, {"refs/heads/master": "a" * 40}, "master"),
+        ({"refs/heads/master": "a" * 40}, {"refs/heads/main": "b" * 40}, "main"),
+        ({"refs/heads/foo/main": "a" * 40}, {"refs/heads/master": "b" * 40}, "master"),
+    ],
+)
+def test_get_default_branch_refs(
+    refs: dict[str, str],
+    packed: dict[str, str],
+    result: str,
+    mocker: MockerFixture,
+    tmp_path: Path,
+) -> None:
+    make_gitdir(tmp_path / ".git", refs, packed)
+    m = mocker.patch("pyrepo.util.readcmd")
+    assert Git(dirpath=tmp_path).get_default_branch() == result
+    m.assert_not_called()
+
+
+def test_get_default_branch_refs_error(mocker: MockerFixture, tmp_path: Path) -> None:
+    make_gitdir(
+        tmp_path / ".git", {"refs/heads/foo": "a" * 40}, {"refs/tags/main": "b" * 40}
+    )
+    m = mocker.patch("pyrepo.util.readcmd")
+    with pytest.raises(InvalidProjectError) as excinfo:
+        Git(dirpath=tmp_path).get_default_branch()
     assert str(excinfo.value) == "Could not determine default Git branch"
-    m.assert_called_once_with("git", "branch", "--format=%(refname:short)", cwd=Path())
+    m.assert_not_called()
+
+
+def test_get_default_branch_reftable(mocker: MockerFixture, tmp_path: Path) -> None:
+    make_gitdir(tmp_path / ".git", {}, {})
+    (tmp_path / ".git" / "reftable").mkdir()
+    m = mocker.patch("pyrepo.util.readcmd", return_value="main")
+    assert Git(dirpath=tmp_path).get_default_branch() == "main"
+    m.assert_called_once_with(
+        "git", "branch", "--format=%(refname:short)", cwd=tmp_path
+    )
+
+
+@pytest.mark.parametrize("pack", [False, True])
+def test_get_latest_tag(
+    pack: bool, mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    init_repo(tmp_path, monkeypatch)
+    commit_in_year(tmp_path, 2019, monkeypatch)
+    subprocess.run(["git", "tag", "v0.1.0"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "tag", "v0.1.1"], cwd=tmp_path, check=True)
+    commit_in_year(tmp_path, 2020, monkeypatch)
+    # An annotated tag created in 2021 on a commit from 2020:
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2021-06-15T12:00:00+00:00")
+    subprocess.run(
+        ["git", "tag", "-a", "-m", "Tag", "v0.2.0"], cwd=tmp_path, check=True
+    )
+    subprocess.run(["git", "tag", "v0.1.2", "HEAD~1"], cwd=tmp_path, check=True)
+    if pack:
+        subprocess.run(["git", "pack-refs", "--all"], cwd=tmp_path, check=True)
+    readcmd = mocker.spy(util, "readcmd")
+    with Git(dirpath=tmp_path) as repo:
+        assert repo.get_latest_tag() == "v0.2.0"
+        subprocess.run(["git", "tag", "-d", "v0.2.0"], cwd=tmp_path, check=True)
+        # Ties are broken by name
+        assert repo.get_latest_tag() == "v0.1.0"
+    # Git picks out the newest tag itself rather than pyrepo reading every tag
+    assert readcmd.call_count == 2
+    assert readcmd.call_args[0][:2] == ("git", "for-each-ref")
+
+
+def test_get_latest_tag_reftable(mocker: MockerFixture, tmp_path: Path) -> None:
+    make_gitdir(tmp_path / ".git", {}, {})
+    (tmp_path / ".git" / "reftable").mkdir()
+    m = mocker.patch("pyrepo.util.readcmd", return_value="v0.2.0")
+    assert Git(dirpath=tmp_path).get_latest_tag() == "v0.2.0"
+    m.assert_called_once_with(
+        "git",
+        "for-each-ref",
+        "--count=1",
+        "--sort=-creatordate",
+        "--format=%(refname:lstrip=2)",
+        "refs/tags",
+        cwd=tmp_path,
+    )
+
+
+def test_get_latest_tag_no_tags(mocker: MockerFixture, tmp_path: Path) -> None:
+    make_gitdir(tmp_path / ".git", {"refs/heads/main": "a" * 40}, {})
+    m = mocker.patch("pyrepo.util.readcmd")
+    assert Git(dirpath=tmp_path).get_latest_tag() is None
+    m.assert_not_called()
+
+
+def test_get_latest_tag_cli_no_tags(mocker: MockerFixture, tmp_path: Path) -> None:
+    m = mocker.patch("pyrepo.util.readcmd", return_value="")
+    assert Git(dirpath=tmp_path).get_latest_tag() is None
+    m.assert_called_once()
+
+
+def test_ref_reader_worktree(tmp_path: Path) -> None:
+    common = tmp_path / "repo" / ".git"
+    make_gitdir(common, {"refs/heads/main": "a" * 40}, {"refs/heads/feature": "b" * 40})
+    wtgitdir = common / "worktrees" / "wt"
+    wtgitdir.mkdir(parents=True)
+    (wtgitdir / "commondir").write_text("../..\n")
+    (wtgitdir / "HEAD").write_text("ref: refs/heads/feature\n")
+    (wtgitdir / "refs" / "bisect").mkdir(parents=True)
+    (wtgitdir / "refs" / "bisect" / "bad").write_text("c" * 40 + "\n")
+    worktree = tmp_path / "wt"
+    worktree.mkdir()
+    (worktree / ".git").write_text(f"gitdir: {wtgitdir}\n")
+    refs = RefReader.for_worktree(worktree)
+    assert refs is not None
+    assert refs.gitdir == wtgitdir.resolve()
+    assert refs.commondir == common.resolve()
+    assert refs.read_symbolic_ref() == "refs/heads/feature"
+    assert refs.read_ref("HEAD") == "b" * 40
+    assert refs.read_ref("refs/heads/main") == "a" * 40
+    assert refs.read_ref("refs/bisect/bad") == "c" * 40
+    assert refs.read_ref("refs/heads/nonexistent") is None
+    assert sorted(refs.iter_refs("refs/heads/")) == [
+        "refs/heads/feature",
+        "refs/heads/main",
+    ]
+    assert not refs.has_refs("refs/tags/")
+
+
+def test_ref_reader_detached_head(tmp_path: Path) -> None:
+    make_gitdir(tmp_path / ".git", {}, {})
+    (tmp_path / ".git" / "HEAD").write_text("d" * 40 + "\n")
+    refs = RefReader.for_worktree(tmp_path)
+    assert refs is not None
+    assert refs.read_symbolic_ref() is None
+    assert refs.read_ref("HEAD") == "d" * 40
+
+
+def test_ref_reader_no_repo(tmp_path: Path) -> None:
+    assert RefReader.for_worktree(tmp_path) is None
+
+
+def test_cat_file_queries(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    init_repo(tmp_path, monkeypatch)
+    with Git(dirpath=tmp_path) as repo:
+        assert repo.resolve("HEAD") is None
+        subprocess.run(
+            [
+                "git",
+                "commit",
+                "--allow-empty",
+                "-q",
+                "-m",
+                "Version 1.0\nwith a long subject",
+                "-m",
+                "First paragraph\n\nSecond paragraph",
+            ],
+            cwd=tmp_path,
+            check=True,
+        )
+        subprocess.run(
+            ["git", "tag", "-a", "-m", "Tag", "v1.0"], cwd=tmp_path, check=True
+        )
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=tmp_path,
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout.strip()
+        assert repo.resolve("HEAD") == head
+        assert repo.resolve("v1.0^{commit}") == head
+        assert repo.resolve("nonexistent") is None
+        assert repo.get_commit_message("v1.0") == (
+            "Version 1.0 with a long subject",
+            "First paragraph\n\nSecond paragraph",
+        )
+        with pytest.raises(ValueError):
+            repo.get_commit_message("nonexistent")
+        # Each kind of query reuses a single process
+        assert len(repo.batch.readers) == 1
+        (reader,) = repo.batch_check.readers
+        proc = reader.proc
+        assert proc is not None
+        assert repo.resolve("HEAD") == head
+        assert repo.batch_check.readers == [reader]
+        assert reader.proc is proc
+    assert proc.returncode == 0
+    assert "batch" not in repo.__dict__
+    assert "batch_check" not in repo.__dict__
+
+
+def test_cat_file_pool(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    init_repo(tmp_path, monkeypatch)
+    subprocess.run(
+        ["git", "commit", "--allow-empty", "-q", "-m", "Initial"],
+        cwd=tmp_path,
+        check=True,
+    )
+    with Git(dirpath=tmp_path) as repo:
+        head = repo.resolve("HEAD")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(repo.resolve, ["HEAD"] * 100))
+        assert results == [head] * 100
+        readers = list(repo.batch_check.readers)
+        assert 1 <= len(readers) <= CAT_FILE_POOL_SIZE
+    assert all(r.proc is None for r in readers)
@@ -1,7 +1,9 @@
 import json
 from operator import attrgetter
 from pathlib import Path
-from shutil import copyfile
+from shutil import copyfile, copytree
+import sys
+from typing import Any
 import pytest
 from pytest_mock import MockerFixture
 from pyrepo.details import ProjectDetails
@@ -9,11 +11,19 @@ from pyrepo.inspecting import (
     InvalidProjectError,
     ModuleInfo,
     extract_requires,
+    file_has_doctests,
     find_module,
+    get_project_metadata,
     parse_requirements,
+    scan_doctests,
 )
 from test_helpers import DATA_DIR, case_dirs, mock_git
 
+if sys.version_info[:2] >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
 
 @case_dirs("find_module", "valid")
 def test_find_module(dirpath: Path) -> None:
@@ -75,6 +85,107 @@ def test_inspect_project(dirpath: Path, mocker: MockerFixture) -> None:
         assert str(excinfo.value) == (dirpath / "_errmsg.txt").read_text().strip()
     else:
         details = ProjectDetails.inspect(dirpath)
+        # The default branch is only determined when needed
+        mgitcls.assert_not_called()
+        assert details.for_json() == json.loads((dirpath / "_inspect.json").read_text())
         mgitcls.assert_called_once_with(dirpath=dirpath)
         mgit.get_default_branch.assert_called_once_with()
-        assert details.for_json() == json.loads((dirpath / "_inspect.json").read_text())
+
+
+def test_get_project_metadata_static(tmp_path: Path, mocker: MockerFixture) -> None:
+    (tmp_path / "pyproject.toml").write_text(
+        "[project]\n"
+        'name = "foobar"\n'
+        'version = "1.2.3"\n'
+        'description = "Foo all the bars"\n'
+        'keywords = ["foo", "bar", "foo"]\n'
+        'dependencies = ["Click ~= 8.0", "attrs >= 20.1"]\n'
+    )
+    mrun = mocker.patch("subprocess.run")
+    with (tmp_path / "pyproject.toml").open("rb") as fp:
+        pyproj = tomllib.load(fp)
+    assert get_project_metadata(tmp_path, pyproj) == {
+        "version": "1.2.3",
+        "description": "Foo all the bars",
+        "dependencies": ["click~=8.0", "attrs>=20.1"],
+        "keywords": ["bar", "foo"],
+    }
+    mrun.assert_not_called()
+
+
+def test_inspect_project_cache(mocker: MockerFixture, tmp_path: Path) -> None:
+    mgitcls, _ = mock_git(mocker, get_default_branch="master")
+    CASE_DIR = DATA_DIR / "inspect_project" / "has-ci"
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(CASE_DIR, tmp_path)
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/master\n")
+    expected = json.loads((CASE_DIR / "_inspect.json").read_text())
+    assert ProjectDetails.inspect(tmp_path).for_json() == expected
+    assert (tmp_path / ".git" / "pyrepo-cache" / "details.json").exists()
+    assert mgitcls.call_count == 1
+    assert ProjectDetails.inspect(tmp_path).for_json() == expected
+    assert mgitcls.call_count == 1
+    # Git operations that don't affect the details don't invalidate the cache
+    (tmp_path / ".git" / "index").write_bytes(b"DIRC")
+    (tmp_path / ".git" / "refs" / "tags").mkdir(parents=True)
+    (tmp_path / ".git" / "refs" / "tags" / "v0.1.0").write_text("a" * 40 + "\n")
+    assert ProjectDetails.inspect(tmp_path).for_json() == expected
+    assert mgitcls.call_count == 1
+    # ... but creating a branch does, as it may change the default branch
+    (tmp_path / ".git" / "refs" / "heads").mkdir()
+    (tmp_path / ".git" / "refs" / "heads" / "main").write_text("a" * 40 + "\n")
+    assert ProjectDetails.inspect(tmp_path).for_json() == expected
+    assert mgitcls.call_count == 2
+    with (tmp_path / "tox.ini").open("a") as fp:
+        print("[testenv:extra]", file=fp)
+    assert ProjectDetails.inspect(tmp_path).for_json() == expected
+    assert mgitcls.call_count == 3
+    assert ProjectDetails.inspect(tmp_path, use_cache=False).for_json() == expected
+    assert mgitcls.call_count == 4
+    # A malformed cache record is treated as a cache miss
+    cachefile = tmp_path / ".git" / "pyrepo-cache" / "details.json"
+    data = json.loads(cachefile.read_text())
+    del data["value"]["python_versions"]
+    cachefile.write_text(json.dumps(data))
+    assert ProjectDetails.inspect(tmp_path).for_json() == expected
+    assert mgitcls.call_count == 5
+    assert "python_versions" in json.loads(cachefile.read_text())["value"]
+
+
+@pytest.mark.parametrize(
+    "src,found",
+    [
+        ("", False),
+        ("def foo():\n    pass\n", False),
+        ('def foo():\n    """\n    >>> foo()\n    """\n', True),
+        (">>> foo()\n", True),
+        ("x = '>>> not a doctest'\n", False),
+        ("x = '>>> not a doctest'\n    >>> foo()\n", True),
+        (">>>foo()\n", False),
+    ],
+)
+def test_file_has_doctests(src: str, found: bool, tmp_path: Path) -> None:
+    p = tmp_path / "foo.py"
+    p.write_text(src)
+    assert file_has_doctests(p) is found
+
+
+def test_scan_doctests_cache(tmp_path: Path, mocker: MockerFixture) -> None:
+    paths = []
+    for i in range(5):
+        p = tmp_path / f"mod{i}.py"
+        p.write_text("x = 1\n")
+        paths.append(p)
+    cache: dict[str, Any] = {str(tmp_path / "gone.py"): [0, 0, True]}
+    assert not scan_doctests(paths, cache=cache)
+    assert sorted(cache) == sorted(map(str, paths))
+    spy = mocker.patch(
+        "pyrepo.inspecting.file_has_doctests", side_effect=file_has_doctests
+    )
+    assert not scan_doctests(paths, cache=cache)
+    spy.assert_not_called()
+    paths[3].write_text("# >>> foo()\n    >>> bar()\n")
+    assert scan_doctests(paths, cache=cache)
+    spy.assert_called_once_with(paths[3])
+    assert cache[str(paths[3])][-1] is True
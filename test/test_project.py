@@ -1,29 +1,174 @@
 from pathlib import Path
 from shutil import copytree
+import subprocess
+from typing import Any
+import pytest
 from pytest_mock import MockerFixture
+from pyrepo.changelog import Changelog
+from pyrepo.details import ProjectDetails
 from pyrepo.project import Project
 from test_helpers import DATA_DIR, assert_dirtrees_eq, mock_git
 
 
 def test_add_pyversion(mocker: MockerFixture, tmp_path: Path) -> None:
-    mgitcls, mgit = mock_git(mocker, get_default_branch="master")
+    mgitcls, _ = mock_git(mocker, get_default_branch="master")
     CASE_DIR = DATA_DIR / "add_pyversion"
     tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
     copytree(CASE_DIR / "before", tmp_path)
     proj = Project.from_directory(tmp_path)
     proj.add_pyversion("3.9")
-    mgitcls.assert_called_once_with(dirpath=tmp_path)
-    mgit.get_default_branch.assert_called_once_with()
+    # The default branch is not needed, so Git is never consulted
+    mgitcls.assert_not_called()
     assert_dirtrees_eq(tmp_path, CASE_DIR / "after")
 
 
 def test_drop_pyversion(mocker: MockerFixture, tmp_path: Path) -> None:
-    mgitcls, mgit = mock_git(mocker, get_default_branch="master")
+    mgitcls, _ = mock_git(mocker, get_default_branch="master")
     CASE_DIR = DATA_DIR / "drop_pyversion"
     tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
     copytree(CASE_DIR / "before", tmp_path)
     proj = Project.from_directory(tmp_path)
     proj.drop_pyversion()
-    mgitcls.assert_called_once_with(dirpath=tmp_path)
-    mgit.get_default_branch.assert_called_once_with()
+    # The default branch is not needed, so Git is never consulted
+    mgitcls.assert_not_called()
     assert_dirtrees_eq(tmp_path, CASE_DIR / "after")
+
+
+def test_drop_pyversion_rollback(mocker: MockerFixture, tmp_path: Path) -> None:
+    mock_git(mocker, get_default_branch="master")
+    CASE_DIR = DATA_DIR / "drop_pyversion"
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(CASE_DIR / "before", tmp_path)
+    proj = Project.from_directory(tmp_path)
+    mocker.patch(
+        "pyrepo.project.drop_pyversion_chlog", side_effect=RuntimeError("Oops")
+    )
+    with pytest.raises(RuntimeError):
+        proj.drop_pyversion()
+    # The edits made before the error (including by begin_dev()) are discarded
+    assert_dirtrees_eq(tmp_path, CASE_DIR / "before")
+    assert proj.tx is None
+    # Changelogs set during the failed transaction are not cached
+    chlog = proj.get_changelog()
+    assert chlog is not None
+    assert "Drop support" not in chlog.sections[0].content
+
+
+def test_pyproject_rollback(mocker: MockerFixture, tmp_path: Path) -> None:
+    mock_git(mocker, get_default_branch="master")
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(DATA_DIR / "drop_pyversion" / "before", tmp_path)
+    pyproject = (tmp_path / "pyproject.toml").read_text()
+    proj = Project.from_directory(tmp_path)
+    with pytest.raises(RuntimeError):
+        with proj.transaction() as tx:
+            proj.pyproject.load(tx)["project"]["name"] = "discarded"
+            raise RuntimeError("Oops")
+    assert (tmp_path / "pyproject.toml").read_text() == pyproject
+    # The failed edit is not saved by a later transaction
+    with proj.transaction() as tx:
+        proj.pyproject.load(tx)
+        tx.write(tmp_path / "extra.txt", "Extra\n")
+    assert (tmp_path / "pyproject.toml").read_text() == pyproject
+    assert proj.pyproject.data()["project"]["name"] != "discarded"
+
+
+def test_add_ci_testenv_rollback_cache(mocker: MockerFixture, tmp_path: Path) -> None:
+    mock_git(mocker, get_default_branch="master")
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(DATA_DIR / "add_ci_testenv" / "plus-typing" / "before", tmp_path)
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/master\n")
+    proj = Project.from_directory(tmp_path)
+    mocker.patch.object(
+        Project, "get_template_writer", side_effect=RuntimeError("Oops")
+    )
+    with pytest.raises(RuntimeError):
+        proj.add_ci_testenv("typing", "3.6")
+    # Computing another lazy field re-stores the cached details, which must not
+    # include the testenv from the failed edit
+    assert not proj.details.has_doctests
+    assert (
+        ProjectDetails.inspect(tmp_path).extra_testenvs
+        == ProjectDetails.inspect(tmp_path, use_cache=False).extra_testenvs
+    )
+
+
+def test_changelog_cache(
+    caplog: pytest.LogCaptureFixture, mocker: MockerFixture, tmp_path: Path
+) -> None:
+    mock_git(mocker, get_default_branch="master")
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(DATA_DIR / "drop_pyversion" / "before", tmp_path)
+    proj = Project.from_directory(tmp_path)
+    spy = mocker.spy(Changelog, "load")
+    proj.drop_pyversion()
+    chlog = proj.get_changelog()
+    assert chlog is not None
+    assert chlog.sections[0].content == "- Drop support for Python 3.6"
+    # Each changelog is parsed once, after which the cached copy is used
+    assert spy.call_count == 1
+    # Modifying a returned changelog does not affect the cache
+    chlog.sections[0].content = "- Something else"
+    assert proj.get_changelog() != chlog
+    # Changes made underneath the project are noticed
+    chlog_path = tmp_path / "CHANGELOG.md"
+    chlog_path.write_text(chlog_path.read_text().replace("Drop", "Dropped"))
+    chlog = proj.get_changelog()
+    assert chlog is not None
+    assert chlog.sections[0].content == "- Dropped support for Python 3.6"
+    assert spy.call_count == 2
+    # Reading a changelog is not an edit
+    assert "No files were modified" not in caplog.text
+
+
+def test_build_cache(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    tmp_path /= "tmp"  # copytree() can't copy to a dir that already exists
+    copytree(DATA_DIR / "inspect_project" / "has-ci", tmp_path)
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Test")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Test")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "test@example.com")
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    subprocess.run(["git", "commit", "-q", "-m", "Initial"], cwd=tmp_path, check=True)
+    dist = tmp_path / "dist"
+
+    def fake_build(*_args: Any, **_kwargs: Any) -> None:
+        dist.mkdir(exist_ok=True)
+        src = (tmp_path / "foobar.py").read_text()
+        (dist / "foobar-0.1.0.tar.gz").write_text(src)
+        (dist / "foobar-0.1.0-py3-none-any.whl").write_text(src)
+
+    mocker.patch("pyrepo.project.get_build_env", return_value=Path("python"))
+    runcmd = mocker.patch("pyrepo.project.runcmd", side_effect=fake_build)
+    with Project.from_directory(tmp_path) as proj:
+        proj.build(clean=True)
+        assert runcmd.call_count == 1
+        built = {p.name: p.read_text() for p in dist.iterdir()}
+        # An unchanged tree reuses the cached artifacts
+        proj.build(clean=True)
+        assert runcmd.call_count == 1
+        assert {p.name: p.read_text() for p in dist.iterdir()} == built
+        # Editing a file (even without staging it) invalidates the cache
+        (tmp_path / "foobar.py").write_text("# Changed\n")
+        proj.build(clean=True)
+        assert runcmd.call_count == 2
+        assert (dist / "foobar-0.1.0.tar.gz").read_text() == "# Changed\n"
+        # Cached artifacts that fail verification are rebuilt
+        for p in (tmp_path / ".git" / "pyrepo-cache" / "builds").glob("*/*.tar.gz"):
+            if p.read_text() == "# Changed\n":
+                p.write_text("# Tampered\n")
+        proj.build(clean=True)
+        assert runcmd.call_count == 3
+        assert (dist / "foobar-0.1.0.tar.gz").read_text() == "# Changed\n"
+        # Reverting the edit brings back the original build
+        (tmp_path / "foobar.py").write_text(built["foobar-0.1.0.tar.gz"])
+        proj.build(clean=True)
+        assert runcmd.call_count == 3
+        assert {p.name: p.read_text() for p in dist.iterdir()} == built
+        # Builds that don't start from a clean slate are never cached
+        proj.build()
+        assert runcmd.call_count == 4
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from pathlib import Path
+import re
+from pytest_mock import MockerFixture
+import tomlkit
+from pyrepo.edit import EditTransaction
+from pyrepo.pyproject import PyProject, add_classifier, merge_toml, remove_classifier
+
+PYPROJECT = """\
+[project]
+name = "foobar"
+requires-python = ">=3.8"
+classifiers = [
+    # Versions:
+    "Programming Language :: Python :: 3.8",
+    "Programming Language :: Python :: 3.9",
+    "License :: OSI Approved :: MIT License",
+]
+
+[tool.hatch.version]
+path = "src/foobar/__init__.py"
+"""
+
+
+def test_pyproject_edit(mocker: MockerFixture, tmp_path: Path) -> None:
+    path = tmp_path / "pyproject.toml"
+    path.write_text(PYPROJECT)
+    pyproject = PyProject(path)
+    spy = mocker.spy(tomlkit, "parse")
+    assert pyproject.data()["project"]["name"] == "foobar"
+    tx = EditTransaction()
+    doc = pyproject.load(tx)
+    assert spy.call_count == 1
+    remove_classifier(doc, "Programming Language :: Python :: 3.8")
+    add_classifier(
+        doc,
+        "Programming Language :: Python :: 3.10",
+        after=re.compile(r"Programming Language :: Python :: \d+\.\d+"),
+    )
+    doc["project"]["requires-python"] = ">=3.9"  # type: ignore[index]
+    merge_toml(doc, tomlkit.parse("\n[tool.mypy]\nstrict = true\n"))
+    # Unsaved edits are not visible to inspection
+    assert pyproject.data()["project"]["requires-python"] == ">=3.8"
+    assert pyproject.load(tx) is doc
+    pyproject.save(tx)
+    tx.commit()
+    assert path.read_text() == (
+        "[project]\n"
+        'name = "foobar"\n'
+        'requires-python = ">=3.9"\n'
+        "classifiers = [\n"
+        "    # Versions:\n"
+        '    "Programming Language :: Python :: 3.9",\n'
+        '    "Programming Language :: Python :: 3.10",\n'
+        '    "License :: OSI Approved :: MIT License",\n'
+        "]\n"
+        "\n"
+        "[tool.hatch.version]\n"
+        'path = "src/foobar/__init__.py"\n'
+        "\n"
+        "[tool.mypy]\n"
+        "strict = true\n"
+    )
+    assert pyproject.data()["tool"]["mypy"] == {"strict": True}
+    assert spy.call_count == 2
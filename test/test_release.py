@@ -0,0 +1,145 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+import click
+import pytest
+from pytest_mock import MockerFixture
+from pyrepo.cache import file_digest
+from pyrepo.commands.release import ReleaseJournal, Releaser, UploadError
+
+
+def test_upload_github(tmp_path: Path) -> None:
+    assets = []
+    for name in ["foo-1.0.tar.gz", "foo-1.0-py3-none-any.whl", "foo.zip"]:
+        (tmp_path / name).write_bytes(b"data")
+        assets.append(tmp_path / name)
+    uploaded: list[str] = []
+
+    def post(url: str, **_kwargs: Any) -> None:
+        if url.endswith("whl"):
+            raise RuntimeError("Connection reset")
+        uploaded.append(url)
+
+    ghrepo = MagicMock()
+    ghrepo.__truediv__.side_effect = lambda url: MagicMock(
+        post=lambda **kwargs: post(url, **kwargs)
+    )
+    releaser = Releaser(
+        project=MagicMock(private=False),
+        version="1.0",
+        ghrepo=ghrepo,
+        tox=False,
+        assets=assets,
+        release_upload_url="https://uploads.example.com/1/assets{?name,label}",
+    )
+    with pytest.raises(UploadError) as excinfo:
+        releaser.upload_github()
+    assert excinfo.value.failures == ["foo-1.0-py3-none-any.whl (GitHub)"]
+    # The other uploads were still carried out
+    assert sorted(uploaded) == [
+        "https://uploads.example.com/1/assets?name=foo-1.0.tar.gz",
+        "https://uploads.example.com/1/assets?name=foo.zip",
+    ]
+
+
+def test_resume(mocker: MockerFixture, tmp_path: Path) -> None:
+    sdist = tmp_path / "foo-1.0.tar.gz"
+    sdist.write_bytes(b"sdist")
+    wheel = tmp_path / "foo-1.0-py3-none-any.whl"
+    wheel.write_bytes(b"wheel")
+    journal = ReleaseJournal(
+        path=tmp_path / "pyrepo-release.json",
+        version="1.0",
+        completed=["end_dev", "build", "twine_check", "commit", "push"],
+        assets={str(sdist): file_digest(sdist), str(wheel): file_digest(wheel)},
+    )
+    journal.save()
+    journal = ReleaseJournal.load(journal.path)  # type: ignore[assignment]
+    assert journal is not None
+    for method in ["end_dev", "build", "twine_check", "commit_version", "push"]:
+        mocker.patch.object(Releaser, method, side_effect=AssertionError(method))
+    mocker.patch("pyrepo.commands.release.runcmd")
+    ghrepo = MagicMock()
+    ghrepo.__truediv__.return_value.post.side_effect = [
+        {"upload_url": "https://uploads.example.com/1/assets{?name,label}"},
+        RuntimeError("Connection reset"),
+        None,
+    ]
+    project = MagicMock(private=False)
+    project.details.uses_versioningit = False
+    project.repo.get_commit_message.return_value = ("v1.0 — Initial release", "")
+    releaser = Releaser(
+        project=project, version="1.0", ghrepo=ghrepo, tox=False, journal=journal
+    )
+    with pytest.raises(UploadError):
+        releaser.run()
+    journal = ReleaseJournal.load(journal.path)  # type: ignore[assignment]
+    assert journal is not None
+    assert "github_release" in journal.completed
+    assert "upload_pypi" in journal.completed
+    assert "upload_github" not in journal.completed
+    assert len(journal.github_uploaded) == 1
+    # On the next resume, only the failed asset is uploaded
+    ghrepo.__truediv__.return_value.post.side_effect = None
+    ghrepo.__truediv__.return_value.post.reset_mock()
+    releaser = Releaser(
+        project=project, version="1.0", ghrepo=ghrepo, tox=False, journal=journal
+    )
+    releaser.run()
+    assert ghrepo.__truediv__.return_value.post.call_count == 1
+    project.begin_dev.assert_called_once_with(True)
+    assert not journal.path.exists()
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '{"version": "1.0", "completed": ["end_dev", "bu',
+        '["1.0"]',
+        '{"version": "1.0", "bogus": true}',
+    ],
+)
+def test_load_invalid_journal(content: str, tmp_path: Path) -> None:
+    path = tmp_path / "pyrepo-release.json"
+    path.write_text(content)
+    with pytest.raises(click.ClickException) as excinfo:
+        ReleaseJournal.load(path)
+    assert str(path) in excinfo.value.message
+
+
+def test_load_no_journal(tmp_path: Path) -> None:
+    assert ReleaseJournal.load(tmp_path / "pyrepo-release.json") is None
+
+
+@pytest.mark.parametrize("versioningit", [False, True])
+@pytest.mark.parametrize("serial", [False, True])
+def test_run_order(mocker: MockerFixture, versioningit: bool, serial: bool) -> None:
+    ran: list[str] = []
+    methods = {
+        "end_dev": "end_dev",
+        "tox_check": "tox",
+        "build": "build",
+        "twine_check": "twine_check",
+        "commit_version": "commit",
+        "push": "push",
+        "mkghrelease": "github_release",
+        "upload_pypi": "upload_pypi",
+        "upload_github": "upload_github",
+    }
+    for method, step in methods.items():
+        mocker.patch.object(
+            Releaser, method, side_effect=lambda step=step: ran.append(step)
+        )
+    project = MagicMock()
+    project.details.uses_versioningit = versioningit
+    project.begin_dev.side_effect = lambda _: ran.append("begin_dev")
+    releaser = Releaser(project=project, version="1.0", ghrepo=MagicMock(), tox=True)
+    steps = releaser.get_steps()
+    releaser.run(serial=serial)
+    assert sorted(ran) == sorted(s.name for s in steps)
+    for s in steps:
+        for d in s.deps:
+            assert ran.index(d) < ran.index(s.name)
+    if serial:
+        assert ran == [s.name for s in steps]
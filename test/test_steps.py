@@ -0,0 +1,45 @@
+from __future__ import annotations
+import threading
+import pytest
+from pyrepo.steps import Step, run_steps
+
+
+def test_run_steps_concurrent() -> None:
+    # "a" and "b" can only both finish if they run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    ran: list[str] = []
+    steps = [
+        Step("a", lambda: ran.append(f"a{barrier.wait()}")),
+        Step("b", lambda: ran.append(f"b{barrier.wait()}")),
+        Step("c", lambda: ran.append("c"), ["a", "b"]),
+    ]
+    run_steps(steps)
+    assert sorted(ran[:2]) in (["a0", "b1"], ["a1", "b0"])
+    assert ran[2] == "c"
+
+
+def test_run_steps_failure() -> None:
+    ran: list[str] = []
+
+    def fail() -> None:
+        raise RuntimeError("Oops")
+
+    steps = [
+        Step("a", fail),
+        Step("b", lambda: ran.append("b")),
+        Step("c", lambda: ran.append("c"), ["a"]),
+        Step("d", lambda: ran.append("d"), ["b"]),
+    ]
+    with pytest.raises(RuntimeError, match="Oops"):
+        run_steps(steps)
+    # Steps that don't depend on the failed step still run
+    assert ran == ["b", "d"]
+    ran.clear()
+    with pytest.raises(RuntimeError, match="Oops"):
+        run_steps(steps, serial=True)
+    assert ran == []
+
+
+def test_run_steps_bad_order() -> None:
+    with pytest.raises(ValueError, match="does not precede"):
+        run_steps([Step("a", lambda: None, ["b"]), Step("b", lambda: None)])
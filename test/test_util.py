@@ -1,15 +1,32 @@
 from __future__ import annotations
 from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from importlib.resources import files
+import importlib.util
 import json
+import os
+from pathlib import Path
+import re
 import time
+from jinja2 import ChoiceLoader, Environment, PackageLoader
 from packaging.specifiers import SpecifierSet
 import pytest
 from pytest_mock import MockerFixture
+from pyversion_info import DATA_URL
+import responses
+from pyrepo import util
+from pyrepo.cache import CacheFile, write_json
 from pyrepo.commands.release import get_mime_type
 from pyrepo.util import (
     Bump,
+    Deferred,
+    LazyField,
+    LineRewriter,
+    LineRule,
     PyVersion,
     bump_version,
+    ensure_license_years,
     join_markup_list,
     mkversion,
     next_version,
@@ -255,3 +272,170 @@ def test_split_markup_list(s: str, items: list[str]) -> None:
 )
 def test_join_markup_list(items: list[str], s: str) -> None:
     assert join_markup_list(items) == s
+
+
+@dataclass(kw_only=True)
+class LazyRecord:
+    name: str
+    size: LazyField[int] = LazyField()
+
+
+def test_lazy_field() -> None:
+    calls: list[str] = []
+
+    def get_size(rec: LazyRecord) -> int:
+        calls.append(rec.name)
+        return len(rec.name)
+
+    rec = LazyRecord(name="foo", size=Deferred(get_size))
+    assert calls == []
+    assert rec.size == 3
+    assert rec.size == 3
+    assert calls == ["foo"]
+    rec.size = 42
+    assert asdict(rec) == {"name": "foo", "size": 42}
+    assert LazyRecord(name="bar", size=17).size == 17
+    with pytest.raises(TypeError):
+        LazyRecord(name="baz")
+
+
+def test_get_jinja_env_shared(monkeypatch: pytest.MonkeyPatch) -> None:
+    jenv = util.get_jinja_env()
+    assert util.get_jinja_env() is jenv
+    # Filters see implementations patched in after the environment is created
+    monkeypatch.setattr(util, "rewrap", lambda _: "patched")
+    assert jenv.from_string("{{ 'foo' | rewrap }}").render() == "patched"
+
+
+def test_precompiled_templates(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    spec = importlib.util.spec_from_file_location(
+        "hatch_build", Path(__file__).parent.parent / "hatch_build.py"
+    )
+    assert spec is not None and spec.loader is not None
+    hatch_build = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(hatch_build)
+    options = hatch_build.load_jinja_options(Path(__file__).parent.parent)
+    # The build hook and pyrepo use the same options
+    assert options == util.JINJA_OPTIONS
+    hatch_build.compile_templates(
+        Path(util.__file__).with_name("templates"), tmp_path, options
+    )
+    monkeypatch.setattr(util, "COMPILED_TEMPLATES_DIR", tmp_path)
+    loader = util.get_template_loader()
+    assert isinstance(loader, ChoiceLoader)
+    jenv = Environment(loader=loader, **util.JINJA_OPTIONS)
+    jenv.filters["years2str"] = util.years2str
+    context = {"author": "John Q. Public", "copyright_years": [2016, 2018, 2019]}
+    tmpl = jenv.get_template("LICENSE.j2")
+    # The template was loaded from a compiled module rather than from source
+    assert tmpl.filename is None or not tmpl.filename.endswith(".j2")
+    reference = Environment(
+        loader=PackageLoader("pyrepo", "templates"), **util.JINJA_OPTIONS
+    )
+    reference.filters["years2str"] = util.years2str
+    assert tmpl.render(context) == reference.get_template("LICENSE.j2").render(context)
+
+
+def test_precompiled_templates_mismatch(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    (tmp_path / "manifest.json").write_text(
+        json.dumps({"jinja2": "0.0", "options": util.JINJA_OPTIONS})
+    )
+    monkeypatch.setattr(util, "COMPILED_TEMPLATES_DIR", tmp_path)
+    assert isinstance(util.get_template_loader(), PackageLoader)
+
+
+@pytest.fixture
+def version_db_env(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> Iterator[CacheFile]:
+    monkeypatch.setenv("PYREPO_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("PYREPO_OFFLINE")
+    util.get_version_database.cache_clear()
+    yield CacheFile(tmp_path / "pyversion-info-data.json")
+    util.get_version_database.cache_clear()
+
+
+def version_data(last_modified: str) -> dict:
+    with (files("pyrepo") / "data" / "pyversion-info-data.json").open() as fp:
+        data = json.load(fp)
+    data["last_modified"] = last_modified
+    assert isinstance(data, dict)
+    return data
+
+
+def test_get_version_database_fetch(version_db_env: CacheFile) -> None:
+    data = version_data("2026-01-01T00:00:00+00:00")
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DATA_URL, json=data)
+        db = util.get_version_database()
+        assert util.get_version_database() is db
+    assert db.last_modified == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert version_db_env.load(DATA_URL) == data
+    # A fresh download is reused by later processes without fetching
+    util.get_version_database.cache_clear()
+    with responses.RequestsMock():
+        assert util.get_version_database().last_modified == db.last_modified
+
+
+def test_get_version_database_fetch_error(version_db_env: CacheFile) -> None:
+    version_db_env.store(DATA_URL, version_data("2025-01-01T00:00:00+00:00"))
+    os.utime(version_db_env.path, (0, 0))
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DATA_URL, status=500)
+        db = util.get_version_database()
+    # The stale download is used
+    assert db.last_modified == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.usefixtures("version_db_env")
+def test_get_version_database_offline(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PYREPO_OFFLINE", "1")
+    with responses.RequestsMock():
+        db = util.get_version_database()
+    # The bundled snapshot is used
+    with (files("pyrepo") / "data" / "pyversion-info-data.json").open(
+        encoding="utf-8"
+    ) as fp:
+        bundled = json.load(fp)
+    assert db.last_modified == datetime.fromisoformat(bundled["last_modified"])
+
+
+def test_write_json_failure(tmp_path: Path) -> None:
+    path = tmp_path / "data.json"
+    write_json(path, {"x": 1})
+    with pytest.raises(TypeError):
+        write_json(path, {"x": object()})
+    # The original file is left intact, and the temporary file is removed
+    assert json.loads(path.read_text()) == {"x": 1}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_line_rewriter(tmp_path: Path) -> None:
+    rewriter = LineRewriter(
+        [
+            LineRule.delete_line(r"#.*"),
+            LineRule.replace_group(r"^version = (\d+)", lambda v: str(int(v) + 1)),
+            LineRule.replace_line(r"name = .*", "name = bar\n"),
+            LineRule(re.compile(r"^\[tool\]"), lambda _m, line: line + "x = 1\n"),
+        ]
+    )
+    path = tmp_path / "foo.cfg"
+    path.write_text(
+        "# comment\nname = foo\nversion = 41\n[tool]\n# version = 0\nname = baz\n"
+    )
+    assert rewriter.rewrite_file(path)
+    assert path.read_text() == "name = bar\nversion = 42\n[tool]\nx = 1\nname = bar\n"
+    # Each line is only rewritten by the first rule that matches it
+    assert rewriter.counts == [2, 1, 2, 1]
+
+
+def test_line_rewriter_unchanged(tmp_path: Path) -> None:
+    path = tmp_path / "LICENSE"
+    path.write_text("Copyright (c) 2020-2022 John Thorvald Wodder II\n")
+    mtime = path.stat().st_mtime_ns
+    assert not ensure_license_years(path, [2021])
+    assert path.stat().st_mtime_ns == mtime
+    assert ensure_license_years(path, [2023])
+    assert path.read_text() == "Copyright (c) 2020-2023 John Thorvald Wodder II\n"
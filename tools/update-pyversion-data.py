@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Replace the snapshot of the Python version database bundled with pyrepo (used
+when the database cannot be fetched) with the latest published version,
+trimmed down to the data that pyrepo actually uses
+"""
+
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any
+from pyversion_info import DATA_URL, VersionDatabase
+import requests
+
+SNAPSHOT = (
+    Path(__file__).parent.parent
+    / "src"
+    / "pyrepo"
+    / "data"
+    / "pyversion-info-data.json"
+)
+
+#: Oldest CPython series to include in the snapshot
+MIN_CPYTHON_SERIES = (2, 6)
+
+#: Oldest PyPy series to include in the snapshot
+MIN_PYPY_SERIES = (7, 0)
+
+
+def series(v: str) -> tuple[int, ...]:
+    return tuple(map(int, v.split(".")[:2]))
+
+
+def trim(data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Reduce the database to what pyrepo needs in order to determine the
+    supported CPython series and the CPython series supported by the latest
+    PyPy series: the release date of the first release of each CPython series,
+    the CPython series' end-of-life dates, and the PyPy releases along with
+    the CPython versions they support
+    """
+    cpython = data["cpython"]
+    pypy = data["pypy"]
+    pypy_releases = {
+        v: d for v, d in pypy["release_dates"].items() if series(v) >= MIN_PYPY_SERIES
+    }
+    return {
+        "last_modified": data["last_modified"],
+        "cpython": {
+            "release_dates": {
+                v: d
+                for v, d in cpython["release_dates"].items()
+                if v.endswith(".0") and series(v) >= MIN_CPYTHON_SERIES
+            },
+            "eol_dates": {
+                v: d
+                for v, d in cpython["eol_dates"].items()
+                if series(v) >= MIN_CPYTHON_SERIES
+            },
+        },
+        "pypy": {
+            "release_dates": pypy_releases,
+            "cpython_versions": {
+                v: cpyvs
+                for v, cpyvs in pypy["cpython_versions"].items()
+                if v in pypy_releases
+            },
+        },
+    }
+
+
+def main() -> None:
+    r = requests.get(DATA_URL, timeout=30)
+    r.raise_for_status()
+    data = trim(r.json())
+    # Make sure the data can actually be used before saving it:
+    db = VersionDatabase.parse_obj(data)
+    with SNAPSHOT.open("w", encoding="utf-8") as fp:
+        json.dump(data, fp, indent=4)
+        print(file=fp)
+    print(f"Updated {SNAPSHOT.name} to data last modified {db.last_modified}")
+
+
+if __name__ == "__main__":
+    main()